@@ -0,0 +1,26 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+def higher(unit):
+    'Whether a bigger value is better for a result in the given unit, i.e. it is a rate.'
+    return unit.endswith('/s')
+
+def report(results):
+    'Print each (name, value, unit) result of a benchmark module as it comes.'
+    for name, value, unit in results:
+        print(f"{name}: {value:.6g} {unit}", flush = True)
+
@@ -0,0 +1,89 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+'Run the benchmark suite saving results as JSON, or compare saved results against a baseline and flag regressions.'
+from . import higher
+from argparse import ArgumentParser, ArgumentTypeError
+from importlib import import_module
+import json, platform, sys, time
+
+modules = 'actor', 'future', 'mailbox', 'delay', 'bg', 'executor', 'metrics', 'memory', 'process', 'shm'
+
+def modulename(name):
+    if name not in modules:
+        raise ArgumentTypeError(f"no such benchmark: {name}")
+    return name
+
+def run(config):
+    results = {}
+    for modulename in config.modules or modules:
+        module = import_module(f".{modulename}", __package__)
+        for _ in range(config.repeat):
+            for name, value, unit in module.results():
+                key = f"{modulename}.{name}"
+                print(f"{key}: {value:.6g} {unit}", flush = True)
+                try:
+                    best = results[key]['value']
+                except KeyError:
+                    pass
+                else:
+                    value = (max if higher(unit) else min)(best, value)
+                results[key] = dict(value = value, unit = unit)
+    with open(config.output, 'w') as f:
+        json.dump(dict(python = platform.python_version(), time = time.strftime('%Y-%m-%dT%H:%M:%S'), results = results), f, indent = 2)
+
+def compare(config):
+    def load(path):
+        with open(path) as f:
+            return json.load(f)['results']
+    baseline, current = load(config.baseline), load(config.current)
+    regressions = 0
+    for key, result in current.items():
+        try:
+            base = baseline[key]['value']
+        except KeyError:
+            continue
+        value, unit = result['value'], result['unit']
+        worse = base / value if higher(unit) else value / base # How many times worse, below 1 is better.
+        flag = ''
+        if worse > 1 + config.threshold:
+            flag = ' REGRESSION'
+            regressions += 1
+        change = f"{(worse - 1) * 100:.1f}% worse" if worse > 1 else f"{(1 / worse - 1) * 100:.1f}% better"
+        print(f"{key}: {base:.6g} -> {value:.6g} {unit} ({change}){flag}")
+    print(f"{regressions} regressions beyond {config.threshold:.0%}.")
+    return 1 if regressions else 0
+
+def main():
+    parser = ArgumentParser(prog = 'python -m bench')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    parser_run = commands.add_parser('run', help = 'run benchmarks, best of repeat runs of each')
+    parser_run.add_argument('--output', '-o', default = 'bench.json')
+    parser_run.add_argument('--repeat', type = int, default = 1)
+    parser_run.add_argument('modules', nargs = '*', type = modulename, metavar = 'module', help = f"any of {', '.join(modules)}, default all")
+    parser_run.set_defaults(function = run)
+    parser_compare = commands.add_parser('compare', help = 'exit status is 1 if any result is worse than baseline beyond threshold')
+    parser_compare.add_argument('--threshold', type = float, default = .1)
+    parser_compare.add_argument('baseline')
+    parser_compare.add_argument('current')
+    parser_compare.set_defaults(function = compare)
+    config = parser.parse_args()
+    sys.exit(config.function(config))
+
+if '__main__' == __name__:
+    main()
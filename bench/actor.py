@@ -0,0 +1,97 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import report
+from concurrent.futures import ThreadPoolExecutor
+from splut.actor import coalesce, Spawn
+from splut.actor.future import Future
+from splut.actor.message import nulloutcome
+import os, time
+
+class Small:
+
+    def ping(self, k):
+        return k
+
+    def refresh(self, key):
+        sum(range(1000))
+
+    @coalesce
+    def coalescedrefresh(self, key):
+        sum(range(1000))
+
+    async def awaits(self, future, n):
+        for _ in range(n):
+            await future
+        return n
+
+def throughput(workers, n = 20000):
+    'Messages per second through an actor with the given number of objects, and as many threads.'
+    with ThreadPoolExecutor(workers) as e:
+        actor = Spawn(e)(*(Small() for _ in range(workers)))
+        start = time.perf_counter()
+        for f in [actor.ping(k) for k in range(n)]:
+            f.wait()
+        return n / (time.perf_counter() - start)
+
+def latency(n = 5000):
+    'Mean seconds from post to a waiting thread having the result.'
+    with ThreadPoolExecutor(1) as e:
+        actor = Spawn(e)(Small())
+        start = time.perf_counter()
+        for k in range(n):
+            actor.ping(k).wait()
+        return (time.perf_counter() - start) / n
+
+def suspend(n = 20000):
+    'Mean seconds for a coroutine method to suspend on an already completed future and be resumed.'
+    done = Future()
+    done.set(nulloutcome)
+    with ThreadPoolExecutor(1) as e:
+        actor = Spawn(e)(Small())
+        start = time.perf_counter()
+        actor.awaits(done, n).wait()
+        return (time.perf_counter() - start) / n
+
+def burst(coalesced, n = 20000, keys = 10):
+    'Mean seconds per call when bursts of calls with a few distinct args are posted to an actor.'
+    with ThreadPoolExecutor(1) as e:
+        actor = Spawn(e)(Small())
+        post = actor.coalescedrefresh if coalesced else actor.refresh
+        start = time.perf_counter()
+        for f in [post(k % keys) for k in range(n)]:
+            f.wait()
+        return (time.perf_counter() - start) / n
+
+def results():
+    workers = 1
+    while True:
+        yield f"throughput {workers}", throughput(workers), 'messages/s'
+        if workers >= os.cpu_count():
+            break
+        workers = min(workers * 2, os.cpu_count())
+    yield 'latency', latency() * 1e6, 'us'
+    yield 'suspend', suspend() * 1e6, 'us'
+    for coalesced in False, True:
+        yield f"burst {'coalesced' if coalesced else 'plain'}", burst(coalesced) * 1e6, 'us'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
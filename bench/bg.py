@@ -0,0 +1,53 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import report
+from splut.bg import Sleeper
+from threading import Event, Thread
+import time
+
+def wake(n = 200, gap = .001):
+    'Mean seconds from Sleeper.interrupt to the sleeping thread running again.'
+    sleeper = Sleeper()
+    ready = Event()
+    interrupted = [None]
+    latencies = []
+    def sleep():
+        for _ in range(n):
+            ready.set()
+            sleeper.sleep()
+            latencies.append(time.perf_counter() - interrupted[0])
+    t = Thread(target = sleep)
+    t.start()
+    for _ in range(n):
+        ready.wait()
+        ready.clear()
+        time.sleep(gap) # Give it time to actually sleep.
+        interrupted[0] = time.perf_counter()
+        sleeper.interrupt()
+    t.join()
+    return sum(latencies) / n
+
+def results():
+    yield 'wake', wake() * 1e6, 'us'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
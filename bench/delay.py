@@ -0,0 +1,71 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import report
+from random import Random
+from splut.delay import Delay, Heap, ShardedDelay, Wheel
+import threading, time
+
+def churn(tasks, n, span = 10, step = .001):
+    'Mean seconds to insert then expire one of n timers spread over span seconds, expiring every step seconds.'
+    d = Delay(tasks = tasks)
+    d._pop(0)
+    random = Random(0)
+    whens = [span * random.random() for _ in range(n)]
+    start = time.perf_counter()
+    for when in whens:
+        d._insert(when, None)
+    insert = time.perf_counter() - start
+    start = time.perf_counter()
+    now = 0
+    while d.tasks.nextwhen() is not None:
+        d._pop(now)
+        now += step
+    return insert / n, (time.perf_counter() - start) / n
+
+def contention(shards, producers = 8, n = 20000):
+    'Scheduling throughput in tasks per second with the given number of producer threads each scheduling n tasks.'
+    d = ShardedDelay(shards)
+    d.start()
+    try:
+        def produce():
+            for _ in range(n):
+                d.after(3600, None)
+        threads = [threading.Thread(target = produce) for _ in range(producers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return producers * n / (time.perf_counter() - start)
+    finally:
+        d.stop()
+
+def results():
+    for n in 1000, 10000, 100000, 1000000:
+        for name, factory in ['heap', Heap], ['wheel', Wheel]:
+            insert, expire = churn(factory(), n)
+            yield f"{name} {n} insert", insert * 1e6, 'us'
+            yield f"{name} {n} expire", expire * 1e6, 'us'
+    for shards in 1, 2, 4, 8:
+        yield f"shards {shards}", contention(shards), 'tasks/s'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
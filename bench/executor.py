@@ -0,0 +1,50 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import report
+from concurrent.futures import ThreadPoolExecutor
+from splut.actor import Spawn
+from splut.actor.executor import StealingExecutor
+import os, time
+
+class Small:
+
+    def ping(self, k):
+        return k
+
+def messages(executor, actors = 1000, rounds = 20):
+    'Messages per second when many small actors each get a few messages at a time.'
+    spawn = Spawn(executor)
+    pool = [spawn(Small()) for _ in range(actors)]
+    start = time.perf_counter()
+    for r in range(rounds):
+        for f in [a.ping(r) for a in pool for _ in range(5)]:
+            f.wait()
+    return actors * rounds * 5 / (time.perf_counter() - start)
+
+def results():
+    threads = os.cpu_count()
+    for cls in ThreadPoolExecutor, StealingExecutor:
+        with cls(threads) as e:
+            yield f"{cls.__name__} {threads}", messages(e), 'messages/s'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,70 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import report
+from splut.actor.future import Future
+from splut.actor.message import nulloutcome
+from threading import Thread
+import time
+
+def listen(n = 100000):
+    'Mean seconds to make a future, listen to it and set it.'
+    listener = lambda o: None
+    start = time.perf_counter()
+    for _ in range(n):
+        f = Future()
+        f.listenoutcome(listener)
+        f.set(nulloutcome)
+    return (time.perf_counter() - start) / n
+
+def setwait(n = 100000):
+    'Mean seconds to make a future, set it and wait for it without blocking.'
+    start = time.perf_counter()
+    for _ in range(n):
+        f = Future()
+        f.set(nulloutcome)
+        f.wait()
+    return (time.perf_counter() - start) / n
+
+def pingpong(n = 5000):
+    'Mean seconds for a round trip between two threads, each blocking on a future set by the other.'
+    pings = [Future() for _ in range(n)]
+    pongs = [Future() for _ in range(n)]
+    def echo():
+        for ping, pong in zip(pings, pongs):
+            pong.set(ping.get())
+    t = Thread(target = echo)
+    t.start()
+    start = time.perf_counter()
+    for ping, pong in zip(pings, pongs):
+        ping.set(nulloutcome)
+        pong.wait()
+    seconds = time.perf_counter() - start
+    t.join()
+    return seconds / n
+
+def results():
+    yield 'listen', listen() * 1e6, 'us'
+    yield 'setwait', setwait() * 1e6, 'us'
+    yield 'pingpong', pingpong() * 1e6, 'us'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
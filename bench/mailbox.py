@@ -0,0 +1,82 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import report
+from splut.actor import Spawn
+from splut.actor.executor import ManualExecutor
+from splut.actor.future import Future
+from splut.actor.mailbox import Mailbox
+from splut.actor.message import Message
+import time
+
+class X:
+
+    def x(self):
+        pass
+
+class Y:
+
+    def y(self):
+        pass
+
+def dispatch(depth, n = 1000):
+    'Mean seconds for a worker to take its next message when depth messages it cannot serve are also queued.'
+    mailbox = Mailbox(ManualExecutor(), [X(), Y()])
+    xworker, yworker = mailbox.workers
+    xworker.idle = yworker.idle = False
+    for _ in range(depth):
+        mailbox.add(Message('y', (), {}, Future()))
+    for _ in range(n):
+        mailbox.add(Message('x', (), {}, Future()))
+    start = time.perf_counter()
+    for _ in range(n):
+        mailbox._another(xworker)
+    return (time.perf_counter() - start) / n
+
+def post(tell, n = 100000):
+    'Mean seconds to post a message to a busy actor, one-way if tell.'
+    actor = Spawn(ManualExecutor())(X())
+    actor.x()
+    start = time.perf_counter()
+    if tell:
+        for _ in range(n):
+            actor.x.tell()
+    else:
+        for _ in range(n):
+            actor.x()
+    return (time.perf_counter() - start) / n
+
+def spawn(n = 100000):
+    'Mean seconds to spawn an actor and post it a message.'
+    spawn = Spawn(ManualExecutor())
+    start = time.perf_counter()
+    for _ in range(n):
+        spawn(X()).x()
+    return (time.perf_counter() - start) / n
+
+def results():
+    yield 'spawn', spawn() * 1e6, 'us'
+    for tell in False, True:
+        yield f"{'tell' if tell else 'call'}", post(tell) * 1e6, 'us'
+    for depth in 10, 100, 1000, 10000, 100000:
+        yield f"dispatch {depth}", dispatch(depth) * 1e6, 'us'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
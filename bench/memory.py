@@ -0,0 +1,56 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import report
+from splut.actor import Spawn
+from splut.actor.executor import ManualExecutor
+import sys, time, tracemalloc
+
+class X:
+
+    def x(self, k):
+        pass
+
+def inflight(n, tell):
+    'Traced bytes per message and seconds to post n messages that all stay queued, with futures unless tell.'
+    actor = Spawn(ManualExecutor())(X())
+    actor.x(None) # Occupy the only worker.
+    post = actor.x.tell if tell else actor.x
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        futures = [post(k) for k in range(n)]
+        seconds = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del futures
+    return size / n, seconds
+
+def results(n = 100000):
+    for tell in False, True:
+        perbytes, seconds = inflight(n, tell)
+        name = 'tell' if tell else 'call'
+        yield f"{name} {n}", perbytes, 'bytes'
+        yield f"{name} {n} post", seconds / n * 1e6, 'us'
+
+def main():
+    report(results(int(sys.argv[1]) if sys.argv[1:] else 1000000))
+
+if '__main__' == __name__:
+    main()
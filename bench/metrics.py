@@ -0,0 +1,47 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import report
+from concurrent.futures import ThreadPoolExecutor
+from splut.actor import Spawn
+from splut.actor.metrics import Metrics
+import time
+
+class Small:
+
+    def ping(self, k):
+        return k
+
+def roundtrip(metrics, n = 20000):
+    'Mean seconds per message for a batch posted to one actor and waited for.'
+    with ThreadPoolExecutor(1) as e:
+        actor = Spawn(e, metrics = metrics)(Small())
+        start = time.perf_counter()
+        for f in [actor.ping(k) for k in range(n)]:
+            f.wait()
+        return (time.perf_counter() - start) / n
+
+def results():
+    yield 'off', roundtrip(None) * 1e6, 'us'
+    yield 'on', roundtrip(Metrics()) * 1e6, 'us'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,47 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import report
+from concurrent.futures import ThreadPoolExecutor
+from splut.actor import Spawn
+from splut.actor.process import ProcessSpawn
+import os, time
+
+class Cruncher:
+
+    def crunch(self, n):
+        return sum(i * i for i in range(n))
+
+def throughput(actors, calls, n):
+    start = time.perf_counter()
+    for f in [actors[i % len(actors)].crunch(n) for i in range(calls)]:
+        f.wait()
+    return calls / (time.perf_counter() - start)
+
+def results(calls = 200, n = 100000):
+    workers = os.cpu_count()
+    with ThreadPoolExecutor(workers) as e:
+        yield f"threads {workers}", throughput([Spawn(e)(*(Cruncher() for _ in range(workers)))], calls, n), 'calls/s'
+    with ProcessSpawn() as spawn:
+        actors = [spawn(Cruncher) for _ in range(workers)]
+        yield f"processes {workers}", throughput(actors, calls, n), 'calls/s'
+
+def main():
+    report(results())
+
+if '__main__' == __name__:
+    main()
@@ -0,0 +1,89 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import report
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+from splut.actor import Spawn
+from splut.actor.shm import Channel, Producer
+import sys, time
+
+class Sink:
+
+    def consume(self, data):
+        return len(data)
+
+def pipeproducer(conn, size, n, q):
+    data = bytes(size)
+    start = time.perf_counter()
+    for _ in range(n):
+        conn.send_bytes(data)
+        assert conn.recv() == size
+    q.put((time.perf_counter() - start) / n)
+
+def channelproducer(address, size, n, q):
+    p = Producer(address)
+    try:
+        actor = p.actor()
+        block = p.allocate(size)
+        start = time.perf_counter()
+        for _ in range(n):
+            assert actor.consume(block).wait() == size
+        q.put((time.perf_counter() - start) / n)
+        block.release()
+    finally:
+        p.close()
+
+def pipe(context, actor, size, n):
+    'Mean seconds per message sent as bytes over a pipe and re-posted to the actor.'
+    q = context.Queue()
+    conn, child = context.Pipe()
+    process = context.Process(target = pipeproducer, args = (child, size, n, q))
+    process.start()
+    for _ in range(n):
+        conn.send(actor.consume(conn.recv_bytes()).wait())
+    process.join()
+    return q.get()
+
+def channel(context, actor, size, n):
+    'Mean seconds per message posted through a Channel with the payload in shared memory.'
+    q = context.Queue()
+    c = Channel(actor)
+    try:
+        process = context.Process(target = channelproducer, args = (c.address, size, n, q))
+        process.start()
+        process.join()
+        return q.get()
+    finally:
+        c.close()
+
+def results(maxsize = 1 << 20):
+    context = get_context()
+    with ThreadPoolExecutor() as e:
+        actor = Spawn(e)(Sink())
+        size = 1 << 10
+        while size <= maxsize:
+            n = max(3, min(1000, (1 << 27) // size))
+            yield f"pipe {size}", pipe(context, actor, size, n) * 1e6, 'us'
+            yield f"shm {size}", channel(context, actor, size, n) * 1e6, 'us'
+            size <<= 5
+
+def main():
+    report(results(int(sys.argv[1]) if sys.argv[1:] else 1 << 30))
+
+if '__main__' == __name__:
+    main()
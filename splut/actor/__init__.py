@@ -15,22 +15,102 @@
 # You should have received a copy of the GNU General Public License
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
-from .future import Future
+from .future import Forget, Future
 from .mailbox import Mailbox
 from .message import Message
-from functools import partial
+from .metrics import MeteredMailbox
+from weakref import WeakValueDictionary
+import logging, time
+
+log = logging.getLogger(__name__)
+forget = Forget(log)
+
+class Post:
+
+    def __init__(self, mailbox, methodname, timeout = None, priority = 0):
+        self.mailbox = mailbox
+        self.methodname = methodname
+        self.timeout = timeout
+        self.priority = priority
+
+    def __call__(self, *args, **kwargs):
+        future = Future()
+        self._add(args, kwargs, future)
+        return future
+
+    def tell(self, *args, **kwargs):
+        '''Post the message without making a future, any failure is logged.'''
+        self._add(args, kwargs, forget)
+
+    def _add(self, args, kwargs, future):
+        self.mailbox.add(Message(self.methodname, args, kwargs, future, None if self.timeout is None else time.monotonic() + self.timeout, self.priority))
+
+    def within(self, timeout):
+        '''Return a variant that gives up on a message if it has not started within the given seconds, in which case its outcome is TimeoutError.'''
+        return type(self)(self.mailbox, self.methodname, timeout, self.priority)
+
+    def at(self, priority):
+        '''Return a variant whose messages are dispatched ahead of those of lower priority, the default being 0.'''
+        return type(self)(self.mailbox, self.methodname, self.timeout, priority)
 
 class Spawn:
 
-    def __init__(self, executor):
+    def __init__(self, executor, capacity = None, policy = None, route = None, metrics = None):
+        '''Each actor's mailbox is bounded by capacity if given, and route picks between its objects, see Mailbox.
+        If metrics is given actors record their timings in it, see Metrics.'''
         self.executor = executor
+        self.capacity = capacity
+        self.policy = policy
+        self.route = route
+        self.metrics = metrics
 
     def __call__(self, *objs):
-        def post(name, *args, **kwargs):
-            future = Future()
-            mailbox.add(Message(name, args, kwargs, future))
-            return future
-        def __getattr__(self, name):
-            return partial(post, name)
-        mailbox = Mailbox(self.executor, objs)
-        return type(f"{''.join({type(obj).__name__: None for obj in objs})}Actor", (), {f.__name__: f for f in [__getattr__]})()
+        types = tuple(type(obj) for obj in objs)
+        clsname = f"{''.join({t.__name__: None for t in types})}Actor"
+        if self.metrics is None:
+            mailbox = Mailbox(self.executor, objs, self.capacity, self.policy, self.route)
+        else:
+            mailbox = MeteredMailbox(self.metrics.actor(clsname), self.executor, objs, self.capacity, self.policy, self.route)
+        return proxy(mailbox, clsname, types)
+
+class Stub:
+    'Stands in for a public method of the actor objects, caching its Post in the proxy on first lookup.'
+
+    __slots__ = 'name',
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, actor, owner):
+        if actor is None:
+            return self
+        actor.__dict__[self.name] = post = Post(actor._mailbox, self.name)
+        return post
+
+def _getattr(actor, name):
+    return Post(actor._mailbox, name)
+
+proxyclasses = WeakValueDictionary() # Each class lives as long as its proxies, and with it the key holding the types.
+
+def coalesce(method):
+    '''Decorate an actor method so that a call to it with the same args as a call still queued is merged into that call, all callers getting the one outcome.
+    Calls with unhashable args are not coalesced.'''
+    method.coalesce = True
+    return method
+
+def proxy(mailbox, clsname, types = ()):
+    '''Return an actor that posts to the given mailbox.
+    Its class is shared by all proxies with the same name and types, and has a stub for each public method of those types.'''
+    key = clsname, types
+    try:
+        cls = proxyclasses[key]
+    except KeyError:
+        names = {name for t in types for name in dir(t) if not name.startswith('_') and callable(getattr(t, name))}
+        proxyclasses[key] = cls = type(clsname, (), dict({name: Stub(name) for name in names}, __getattr__ = _getattr))
+    actor = cls()
+    actor._mailbox = mailbox
+    return actor
+
+def depth(actor):
+    'Return how many messages are queued for the given local actor.'
+    return actor._mailbox.depth
@@ -0,0 +1,64 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+'Bridges between splut futures and asyncio or concurrent.futures futures.'
+from .future import AbruptOutcome, Future, NormalOutcome
+import asyncio, logging
+
+log = logging.getLogger(__name__)
+
+def _settle(asyncfuture, outcome):
+    if not asyncfuture.cancelled():
+        try:
+            value = outcome.result()
+        except BaseException as e:
+            asyncfuture.set_exception(e)
+        else:
+            asyncfuture.set_result(value)
+
+def toasyncio(future, loop = None):
+    '''Return an asyncio future on the given loop, by default the running one, that completes with the outcome of the given splut future.
+    No thread is blocked while waiting.'''
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    asyncfuture = loop.create_future()
+    def listener(outcome):
+        try:
+            loop.call_soon_threadsafe(_settle, asyncfuture, outcome)
+        except RuntimeError: # Loop closed, nobody left to tell.
+            log.debug('Dropped outcome for closed loop.')
+    future.listenoutcome(listener)
+    return asyncfuture
+
+def fromconcurrent(concurrentfuture):
+    'Return a splut future, awaitable in actor coroutines, that completes with the outcome of the given concurrent.futures future.'
+    future = Future()
+    def callback(f):
+        try:
+            value = f.result()
+        except BaseException as e:
+            future.set(AbruptOutcome(e))
+        else:
+            future.set(NormalOutcome(value))
+    concurrentfuture.add_done_callback(callback)
+    return future
+
+def fromasyncio(awaitable, loop):
+    'Return a splut future, awaitable in actor coroutines, that completes with the outcome of the given asyncio awaitable run on the given loop.'
+    async def main():
+        return await awaitable
+    return fromconcurrent(asyncio.run_coroutine_threadsafe(main(), loop))
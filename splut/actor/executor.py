@@ -0,0 +1,123 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from collections import deque
+from functools import partial
+from itertools import count
+from threading import Condition, Lock, Thread
+import logging, os
+
+log = logging.getLogger(__name__)
+
+class StealingExecutor:
+    '''Thread pool for Spawn that pins each actor worker to a preferred thread with its own run queue, idle threads steal from busy ones.
+    Unlike ThreadPoolExecutor submit returns nothing, and a task that raises is logged.'''
+
+    def __init__(self, threads = None):
+        n = os.cpu_count() if threads is None else threads
+        self.lock = Lock()
+        self.runqueues = [deque() for _ in range(n)]
+        self.wakeups = [Condition(self.lock) for _ in range(n)]
+        self.sleeping = set() # Indices of threads waiting for work.
+        self.unpinned = count()
+        self.closed = False
+        self.threads = [Thread(name = f"{type(self).__name__}-{i}", target = self._loop, args = [i], daemon = True) for i in range(n)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, f, *args):
+        'The first arg, if any, determines the preferred thread, so tasks for the same actor worker tend to run on the same thread.'
+        if self.closed:
+            raise RuntimeError('Executor has been shut down.')
+        n = len(self.runqueues)
+        i = hash(args[0]) % n if args else next(self.unpinned) % n
+        self.runqueues[i].append(partial(f, *args))
+        if self.sleeping: # Otherwise any thread that is about to sleep will see the task, as it registers in sleeping before its last look.
+            with self.lock:
+                if self.sleeping:
+                    j = i if i in self.sleeping else next(iter(self.sleeping))
+                    self.sleeping.remove(j)
+                    self.wakeups[j].notify()
+
+    def _take(self, i):
+        try:
+            return self.runqueues[i].popleft()
+        except IndexError:
+            pass
+        n = len(self.runqueues)
+        for k in range(1, n):
+            try:
+                return self.runqueues[(i + k) % n].pop() # Opposite end to the owner.
+            except IndexError:
+                pass
+
+    def _loop(self, i):
+        while True:
+            task = self._take(i)
+            if task is None:
+                with self.lock:
+                    self.sleeping.add(i) # Before looking, so a submit that appends after we look will also see us.
+                    task = self._take(i)
+                    if task is None:
+                        if self.closed:
+                            self.sleeping.discard(i)
+                            break
+                        self.wakeups[i].wait()
+                    self.sleeping.discard(i)
+                    if task is None:
+                        continue
+            try:
+                task()
+            except BaseException:
+                log.exception('Task failed:')
+
+    def shutdown(self, wait = True):
+        'Pending tasks are still run.'
+        with self.lock:
+            self.closed = True
+            for c in self.wakeups:
+                c.notify()
+            self.sleeping.clear()
+        if wait:
+            for t in self.threads:
+                t.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+class ManualExecutor:
+    '''Executor that holds submitted tasks until run, so that tests and benchmarks decide exactly when work happens.
+    Each held task is a (f, args) pair in tasks.'''
+
+    def __init__(self):
+        self.tasks = []
+
+    def submit(self, f, *args):
+        self.tasks.append((f, args))
+
+    def run(self):
+        'Run held tasks in order until there are none, including any they submit, and return how many ran.'
+        n = 0
+        while self.tasks:
+            f, args = self.tasks.pop(0)
+            f(*args)
+            n += 1
+        return n
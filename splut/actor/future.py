@@ -15,10 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
-from threading import Condition
+from functools import partial
+from threading import Lock
 
 class NormalOutcome:
 
+    __slots__ = 'obj',
+
     def __init__(self, obj):
         self.obj = obj
 
@@ -33,6 +36,8 @@ class NormalOutcome:
 
 class AbruptOutcome:
 
+    __slots__ = 'e',
+
     def __init__(self, e):
         self.e = e
 
@@ -45,40 +50,80 @@ class AbruptOutcome:
     def forget(self, log):
         log.error('Task failed:', exc_info = self.e)
 
+class Forget:
+    'Stands in for a Future whose outcome nobody wants, failures are logged.'
+
+    __slots__ = 'log',
+
+    def __init__(self, log):
+        self.log = log
+
+    def set(self, outcome):
+        outcome.forget(self.log)
+
+class Fanout:
+    'Stands in for the futures of coalesced messages, giving them all the one outcome.'
+
+    __slots__ = 'futures', 'key'
+
+    def __init__(self, future):
+        self.futures = [future]
+        self.key = None
+
+    def set(self, outcome):
+        for f in self.futures:
+            f.set(outcome)
+
 class Future:
 
+    __slots__ = 'lock', 'callbacks', 'outcome'
+
     def __init__(self):
-        self.condition = Condition()
-        self.callbacks = []
+        self.lock = Lock()
+        self.callbacks = None # Allocated on first listener.
         self.outcome = None
 
     def set(self, outcome):
         assert outcome is not None
-        with self.condition:
+        with self.lock:
             assert self.outcome is None
             self.outcome = outcome
-            self.condition.notify_all()
             callbacks, self.callbacks = self.callbacks, None
-        for f in callbacks:
-            f(outcome)
-
-    def get(self):
-        with self.condition:
-            while True:
-                outcome = self.outcome
-                if outcome is not None:
-                    return outcome
-                self.condition.wait()
+        if callbacks is not None:
+            for f in callbacks:
+                f(outcome)
+
+    def get(self, timeout = None):
+        '''Block until there is an outcome and return it, or raise TimeoutError after the given number of seconds.'''
+        outcome = self.outcome
+        if outcome is None: # Only now pay for something to wait on.
+            waiter = Lock()
+            waiter.acquire()
+            def release(outcome):
+                waiter.release()
+            self.listenoutcome(release)
+            if not waiter.acquire(timeout = -1 if timeout is None else timeout):
+                with self.lock:
+                    if self.outcome is None: # Otherwise it's too late to stop release, but we may as well return the outcome.
+                        self.callbacks.remove(release)
+                        if not self.callbacks:
+                            self.callbacks = None
+                        raise TimeoutError
+            outcome = self.outcome
+        return outcome
 
-    def wait(self):
-        return self.get().result()
+    def wait(self, timeout = None):
+        return self.get(timeout).result()
 
     def listenoutcome(self, f):
-        with self.condition:
-            if self.callbacks is not None:
-                self.callbacks.append(f)
-                return
+        with self.lock:
             outcome = self.outcome
+            if outcome is None:
+                if self.callbacks is None:
+                    self.callbacks = [f]
+                else:
+                    self.callbacks.append(f)
+                return
         f(outcome)
 
     def __await__(self):
@@ -86,3 +131,72 @@ class Future:
 
     def andforget(self, log):
         self.listenoutcome(lambda o: o.forget(log))
+
+    @classmethod
+    def allof(cls, futures):
+        '''Return a future of the list of results once all have succeeded, or of the first failure.
+        Like all combinators this does not block a thread, and can be awaited in an actor coroutine.'''
+        futures = list(futures)
+        combined = cls()
+        values = [None] * len(futures)
+        pending = [len(futures)]
+        lock = Lock()
+        def listener(i, outcome):
+            with lock:
+                if not pending[0]:
+                    return
+                if isinstance(outcome, AbruptOutcome):
+                    pending[0] = 0
+                else:
+                    values[i] = outcome.obj
+                    pending[0] -= 1
+                    if pending[0]:
+                        return
+                    outcome = NormalOutcome(values)
+            combined.set(outcome)
+        if not futures:
+            combined.set(NormalOutcome(values))
+        for i, f in enumerate(futures):
+            f.listenoutcome(partial(listener, i))
+        return combined
+
+    @classmethod
+    def anyof(cls, futures):
+        '''Return a future of the first successful result, or of the last failure if none succeed.
+        Fails with ValueError if there are no futures.'''
+        futures = list(futures)
+        combined = cls()
+        pending = [len(futures)]
+        lock = Lock()
+        def listener(outcome):
+            with lock:
+                if not pending[0]:
+                    return
+                pending[0] = pending[0] - 1 if isinstance(outcome, AbruptOutcome) else 0
+                if pending[0]:
+                    return
+            combined.set(outcome)
+        if not futures:
+            combined.set(AbruptOutcome(ValueError('No futures.')))
+        for f in futures:
+            f.listenoutcome(listener)
+        return combined
+
+    @classmethod
+    def firstcompleted(cls, futures):
+        '''Return a future of whichever future completes first, successfully or not, or of None if there are no futures.'''
+        futures = list(futures)
+        combined = cls()
+        done = [False]
+        lock = Lock()
+        def listener(f, outcome):
+            with lock:
+                if done[0]:
+                    return
+                done[0] = True
+            combined.set(NormalOutcome(f))
+        if not futures:
+            combined.set(NormalOutcome(None))
+        for f in futures:
+            f.listenoutcome(partial(listener, f))
+        return combined
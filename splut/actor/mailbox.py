@@ -15,42 +15,180 @@
 # You should have received a copy of the GNU General Public License
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
-from threading import Lock
+from .future import Fanout
+from .message import Message
+from .route import FirstIdle
+from collections import deque
+from itertools import count
+from threading import Condition, Lock
+import time
+
+class Full(Exception): pass
+
+class Block:
+    '''Make the poster wait for space, or fail the message with Full after timeout seconds if given.
+    Beware of deadlock if an actor posts to its own full mailbox.'''
+
+    def __init__(self, timeout = None):
+        self.timeout = timeout
+
+    def overflow(self, mailbox, message, failed):
+        if mailbox.space.wait_for(lambda: mailbox.depth < mailbox.capacity, self.timeout): # Timeout covers every wakeup, and we return holding the space.
+            return True
+        failed.append((message, Full('Timed out waiting for space.')))
+
+class Fail:
+    '''Fail the new message with Full.'''
+
+    def overflow(self, mailbox, message, failed):
+        failed.append((message, Full('Mailbox is full.')))
+
+class DropOldest:
+    '''Fail the oldest queued message with Full to make space, or the new message if only resumptions are queued.'''
+
+    def overflow(self, mailbox, message, failed):
+        oldest = min((q for q in mailbox.queues.values() if q[0][1].bounded), key = lambda q: q[0][0] + q[0][1].priority * mailbox.aging, default = None)
+        if oldest is None: # Only resumptions are queued, which must not be dropped.
+            failed.append((message, Full('Mailbox is full.')))
+        else:
+            failed.append((mailbox._popleft(oldest), Full('Dropped for newer message.')))
+            return True
 
 class Worker:
 
+    __slots__ = 'idle', 'obj', 'keys', 'lastused'
+
     def __init__(self, obj):
         self.idle = True
         self.obj = obj
+        self.keys = {}
+        self.lastused = -1
+
+    def accepts(self, message):
+        key = message.key
+        try:
+            return self.keys[key]
+        except KeyError:
+            self.keys[key] = accepted = message.accepts(self.obj)
+            return accepted
 
 class Mailbox:
 
-    def __init__(self, executor, objs):
-        self.queue = []
+    aging = 100 # How many newer messages a message overtakes per unit of priority.
+
+    def __init__(self, executor, objs, capacity = None, policy = None, route = None):
+        '''If capacity is given, new messages beyond that many queued are handled by the policy, by default Block.
+        Coroutine resumptions are queued regardless.
+        The route decides which idle worker gets a message, by default FirstIdle.
+        Higher priority messages are dispatched first, but only until they are aging times priority messages younger than the oldest.
+        A call to a method decorated with coalesce is merged into an identical call still queued.'''
+        self.queues = {} # Pending messages by priority and key, each queue is FIFO.
+        self.coalescing = {} # Whether to coalesce by method name.
+        self.coalesced = {} # Fanout of each queued coalescing call by method name and args.
+        self.depth = 0
+        self.seq = count()
         self.lock = Lock()
+        self.space = Condition(self.lock)
         self.executor = executor
         self.workers = [Worker(obj) for obj in objs]
+        self.capacity = capacity
+        self.policy = Block() if policy is None else policy
+        self.route = FirstIdle() if route is None else route
+        self.uses = count()
+
+    def _coalescekey(self, message):
+        name = message.methodname
+        try:
+            coalescing = self.coalescing[name]
+        except KeyError:
+            self.coalescing[name] = coalescing = any(getattr(getattr(w.obj, name, None), 'coalesce', False) for w in self.workers)
+        if coalescing:
+            key = name, message.args, frozenset(message.kwargs.items()), message.priority, message.deadline # Merging must not change when the call runs or fails.
+            try:
+                hash(key)
+            except TypeError:
+                return
+            return key
+
+    def _wrap(self, message):
+        return self.route.prepare(self.workers, message)
 
     def add(self, message):
-        with self.lock:
-            for worker in self.workers:
-                if worker.idle:
-                    task = message.taskornone(worker.obj, self)
-                    if task is not None:
-                        self.executor.submit(self._run, worker, task)
-                        worker.idle = False
+        key = self._coalescekey(message) if isinstance(message, Message) else None
+        if key is not None:
+            message.future = fanout = Fanout(message.future)
+        message = self._wrap(message)
+        failed = []
+        try:
+            with self.lock:
+                while True:
+                    if key is not None:
+                        try:
+                            pending = self.coalesced[key]
+                        except KeyError:
+                            pass
+                        else:
+                            pending.futures.extend(fanout.futures)
+                            return
+                    for worker in self.route.candidates(self.workers):
+                        if worker.idle and worker.accepts(message):
+                            self.executor.submit(self._run, worker, message.task(worker.obj, self))
+                            worker.idle = False
+                            worker.lastused = next(self.uses)
+                            return
+                    if self.capacity is None or self.depth < self.capacity or not message.bounded:
                         break
-            else:
-                self.queue.append(message)
+                    if not self.policy.overflow(self, message, failed):
+                        return
+                lane = message.priority, message.key
+                try:
+                    queue = self.queues[lane]
+                except KeyError:
+                    self.queues[lane] = queue = deque()
+                queue.append((next(self.seq) - message.priority * self.aging, message))
+                self.depth += 1
+                if key is not None:
+                    fanout.key = key
+                    self.coalesced[key] = fanout
+        finally:
+            for m, e in failed: # Outside the lock as listeners may post to us.
+                m.fail(e)
+
+    def _popleft(self, queue):
+        _, message = queue.popleft()
+        if not queue:
+            del self.queues[message.priority, message.key]
+        if self.coalesced:
+            future = getattr(message, 'future', None)
+            if type(future) is Fanout and future.key is not None:
+                del self.coalesced[future.key]
+                future.key = None
+        self.depth -= 1
+        if self.capacity is not None:
+            self.space.notify()
+        return message
 
     def _another(self, worker):
-        with self.lock:
-            for i, message in enumerate(self.queue):
-                task = message.taskornone(worker.obj, self)
-                if task is not None:
-                    self.queue.pop(i)
-                    return task
-            worker.idle = True
+        failed = []
+        try:
+            with self.lock:
+                while True:
+                    best = None
+                    for queue in self.queues.values(): # Cost is proportional to distinct lanes, not queue depth.
+                        rank, message = queue[0]
+                        if (best is None or rank < best[0][0]) and worker.accepts(message):
+                            best = queue
+                    if best is None:
+                        worker.idle = True
+                        return
+                    message = self._popleft(best)
+                    worker.lastused = next(self.uses)
+                    if message.deadline is None or time.monotonic() < message.deadline:
+                        return message.task(worker.obj, self)
+                    failed.append((message, TimeoutError(f"Not started by deadline: {message.methodname}")))
+        finally:
+            for m, e in failed:
+                m.fail(e)
 
     def _run(self, worker, task):
         while True:
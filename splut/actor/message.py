@@ -16,48 +16,73 @@
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
 from .future import AbruptOutcome, NormalOutcome
-from diapyr.util import innerclass
 from functools import partial
 from inspect import iscoroutinefunction
 
 nulloutcome = NormalOutcome(None)
+resumption = 1 << 32 # Priority of coroutine resumptions, so in-flight coroutines finish before new work starts.
 
 class Message:
 
-    def __init__(self, methodname, args, kwargs, future):
+    __slots__ = 'methodname', 'args', 'kwargs', 'future', 'deadline', 'priority'
+    bounded = True
+
+    def __init__(self, methodname, args, kwargs, future, deadline = None, priority = 0):
         self.methodname = methodname
         self.args = args
         self.kwargs = kwargs
         self.future = future
+        self.deadline = deadline
+        self.priority = priority
 
-    def taskornone(self, obj, mailbox):
-        try:
-            method = getattr(obj, self.methodname)
-        except AttributeError:
-            return
+    @property
+    def key(self):
+        return self.methodname
+
+    def accepts(self, obj):
+        return hasattr(obj, self.methodname)
+
+    def task(self, obj, mailbox):
+        method = getattr(obj, self.methodname)
         if iscoroutinefunction(method):
             return partial(Coro(obj, method(*self.args, **self.kwargs), self.future).fire, nulloutcome, mailbox)
         return partial(self._fire, method)
 
+    def fail(self, e):
+        self.future.set(AbruptOutcome(e))
+
     def _fire(self, method):
         try:
             value = method(*self.args, **self.kwargs)
         except BaseException as e:
             self.future.set(AbruptOutcome(e))
         else:
-            self.future.set(NormalOutcome(value))
+            self.future.set(nulloutcome if value is None else NormalOutcome(value))
 
 class Coro:
 
-    @innerclass
     class Message:
 
-        def __init__(self, outcome):
+        __slots__ = 'coro', 'outcome'
+        bounded = False
+        deadline = None
+        priority = resumption
+
+        def __init__(self, coro, outcome):
+            self.coro = coro
             self.outcome = outcome
 
-        def taskornone(self, obj, mailbox):
-            if obj is self.obj:
-                return partial(self.fire, self.outcome, mailbox)
+        @property
+        def key(self):
+            return id(self.coro.obj)
+
+        def accepts(self, obj):
+            return obj is self.coro.obj
+
+        def task(self, obj, mailbox):
+            return partial(self.coro.fire, self.outcome, mailbox)
+
+    __slots__ = 'obj', 'coro', 'future'
 
     def __init__(self, obj, coro, future):
         self.obj = obj
@@ -68,7 +93,7 @@ class Coro:
         try:
             g = outcome.propagate(self.coro)
         except StopIteration as e:
-            self.future.set(NormalOutcome(e.value))
+            self.future.set(nulloutcome if e.value is None else NormalOutcome(e.value))
         except BaseException as e:
             self.future.set(AbruptOutcome(e))
         else:
@@ -77,4 +102,4 @@ class Coro:
             except AttributeError:
                 self.future.set(AbruptOutcome(RuntimeError(f"Unusable yield: {g}")))
             else:
-                listenoutcome(lambda o: mailbox.add(self.Message(o)))
+                listenoutcome(lambda o: mailbox.add(self.Message(self, o)))
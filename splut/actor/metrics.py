@@ -0,0 +1,146 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from .mailbox import Mailbox
+from .message import Coro
+from bisect import bisect_left
+from functools import partial
+from threading import Lock
+import time
+
+class Histogram:
+    'Counts of values in fixed buckets, the last bucket being for values above the greatest bound.'
+
+    __slots__ = 'bounds', 'counts', 'total'
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+
+    def record(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def snapshot(self):
+        return dict(bounds = self.bounds, counts = list(self.counts), total = self.total)
+
+class MethodMetrics:
+
+    secondsbounds = tuple(10 ** (e / 2) for e in range(-12, 3)) # 1us to 10s.
+
+    def __init__(self):
+        self.wait = Histogram(self.secondsbounds)
+        self.service = Histogram(self.secondsbounds)
+        self.suspensions = 0
+
+    def snapshot(self):
+        return dict(wait = self.wait.snapshot(), service = self.service.snapshot(), suspensions = self.suspensions)
+
+class ActorMetrics:
+
+    depthbounds = tuple(2 ** e for e in range(17))
+
+    def __init__(self):
+        self.lock = Lock()
+        self.depth = Histogram((0,) + self.depthbounds)
+        self.methods = {}
+
+    def method(self, name):
+        try:
+            return self.methods[name]
+        except KeyError:
+            return self.methods.setdefault(name, MethodMetrics())
+
+    def snapshot(self):
+        with self.lock:
+            return dict(depth = self.depth.snapshot(), methods = {name: m.snapshot() for name, m in self.methods.items()})
+
+class Metrics:
+    '''Pass to Spawn to record, for each actor, queue depth seen by each new message and per method histograms of seconds from post to start and of service time, and counts of coroutine suspensions.
+    Actors with the same proxy class name are aggregated. Without this the actor core does no extra work.'''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.actors = {}
+
+    def actor(self, name):
+        with self.lock:
+            try:
+                return self.actors[name]
+            except KeyError:
+                self.actors[name] = metrics = ActorMetrics()
+                return metrics
+
+    def snapshot(self):
+        with self.lock:
+            actors = list(self.actors.items())
+        return {name: metrics.snapshot() for name, metrics in actors}
+
+class Metered:
+    'Message wrapper that records its timings when its task runs.'
+
+    __slots__ = 'message', 'lock', 'metrics', 'enqueued', 'key', 'priority', 'deadline', 'bounded'
+
+    def __init__(self, message, lock, metrics):
+        self.message = message
+        self.lock = lock
+        self.metrics = metrics
+        self.enqueued = time.perf_counter()
+        self.key = message.key # Copy what the mailbox reads often.
+        self.priority = message.priority
+        self.deadline = message.deadline
+        self.bounded = message.bounded
+
+    def __getattr__(self, name):
+        return getattr(self.message, name)
+
+    def accepts(self, obj):
+        return self.message.accepts(obj)
+
+    def task(self, obj, mailbox):
+        return partial(self._run, self.message.task(obj, mailbox))
+
+    def fail(self, e):
+        self.message.fail(e)
+
+    def _run(self, task):
+        start = time.perf_counter()
+        try:
+            task()
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.metrics.wait.record(start - self.enqueued)
+                self.metrics.service.record(end - start)
+
+class MeteredMailbox(Mailbox):
+
+    def __init__(self, metrics, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    def _wrap(self, message):
+        metrics = self.metrics
+        resumption = isinstance(message, Coro.Message)
+        with metrics.lock:
+            metrics.depth.record(self.depth)
+            m = metrics.method(message.coro.coro.__name__ if resumption else message.methodname)
+            if resumption:
+                m.suspensions += 1
+        return super()._wrap(Metered(message, metrics.lock, m))
@@ -0,0 +1,143 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import proxy
+from .future import AbruptOutcome, Future
+from .mailbox import Mailbox
+from .message import Message
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import count
+from threading import Lock, Thread
+import multiprocessing
+
+def _serve(requests, replies, factory, args, kwargs):
+    sendlock = Lock()
+    def reply(msgid, outcome):
+        with sendlock:
+            try:
+                replies.send((msgid, outcome))
+            except Exception as e: # Most likely the result isn't picklable.
+                replies.send((msgid, AbruptOutcome(e)))
+    try:
+        obj = factory(*args, **kwargs)
+    except BaseException as e:
+        reply(None, AbruptOutcome(e))
+        return
+    with ThreadPoolExecutor(1) as executor:
+        mailbox = Mailbox(executor, [obj])
+        while True:
+            item = requests.recv()
+            if item is None:
+                break
+            msgid, methodname, args, kwargs, deadline, priority = item
+            future = Future()
+            future.listenoutcome(partial(reply, msgid))
+            mailbox.add(Message(methodname, args, kwargs, future, deadline, priority))
+
+class ProcessMailbox:
+    'Stands in for Mailbox, forwarding messages to an object living in a dedicated worker process.'
+
+    def __init__(self, context, factory, args, kwargs):
+        self.futures = {}
+        self.broken = None
+        self.lock = Lock()
+        self.msgids = count()
+        requests, self.requests = context.Pipe(False)
+        self.replies, replies = context.Pipe(False)
+        self.process = context.Process(target = _serve, args = (requests, replies, factory, args, kwargs), daemon = True)
+        self.process.start()
+        requests.close()
+        replies.close()
+        self.reader = Thread(target = self._read, daemon = True)
+        self.reader.start()
+
+    def add(self, message):
+        with self.lock:
+            outcome = self.broken
+            if outcome is None:
+                msgid = next(self.msgids)
+                try:
+                    self.requests.send((msgid, message.methodname, message.args, message.kwargs, message.deadline, message.priority))
+                except OSError: # Process has gone, _read will fail the future.
+                    self.futures[msgid] = message.future
+                    return
+                except BaseException as e:
+                    outcome = AbruptOutcome(e)
+                else:
+                    self.futures[msgid] = message.future
+                    return
+        message.future.set(outcome)
+
+    def _read(self):
+        while True:
+            try:
+                msgid, outcome = self.replies.recv()
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                if msgid is None:
+                    self.broken = outcome
+                    continue
+                future = self.futures.pop(msgid)
+            future.set(outcome)
+        with self.lock:
+            if self.broken is None:
+                self.broken = AbruptOutcome(EOFError('Actor process has exited.'))
+            futures, self.futures = self.futures, {}
+        for future in futures.values():
+            future.set(self.broken)
+
+    def close(self):
+        'Let the worker process finish its messages and exit.'
+        with self.lock:
+            if self.broken is None:
+                try:
+                    self.requests.send(None)
+                except OSError:
+                    pass
+        self.reader.join()
+        self.process.join()
+        self.requests.close()
+        self.replies.close()
+
+class ProcessSpawn:
+    '''Like Spawn, but each actor object is made by calling the given factory in a dedicated worker process, so CPU-bound actors aren't limited by the GIL.
+    Factory, messages and outcomes must be picklable, and the proxy and futures behave as with Spawn.
+    The default context is forkserver where available, otherwise spawn, as forking a process with reader threads is unsafe.'''
+
+    def __init__(self, context = None):
+        if context is None:
+            context = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.context = multiprocessing.get_context(context)
+        self.mailboxes = []
+
+    def __call__(self, factory, *args, **kwargs):
+        mailbox = ProcessMailbox(self.context, factory, args, kwargs)
+        self.mailboxes.append(mailbox)
+        return proxy(mailbox, f"{factory.__name__}Actor", (factory,) if isinstance(factory, type) else ())
+
+    def shutdown(self):
+        for mailbox in self.mailboxes:
+            mailbox.close()
+        self.mailboxes.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
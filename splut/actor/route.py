@@ -0,0 +1,98 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from bisect import bisect
+from random import Random
+
+class FirstIdle:
+    'Offer each message to the idle workers in list order, the default.'
+
+    def prepare(self, workers, message):
+        return message
+
+    def candidates(self, workers):
+        return workers
+
+class RoundRobin(FirstIdle):
+    'Offer each message first to the worker after the one most recently given a message.'
+
+    def candidates(self, workers):
+        i = max(range(len(workers)), key = lambda i: (workers[i].lastused, i)) + 1
+        return workers[i:] + workers[:i]
+
+class LeastRecentlyUsed(FirstIdle):
+    'Offer each message first to the worker that has waited longest since it was last given one.'
+
+    def candidates(self, workers):
+        return sorted(workers, key = lambda w: w.lastused)
+
+class Sticky:
+    'Message that only the given object may serve.'
+
+    __slots__ = 'message', 'obj', 'key'
+
+    def __init__(self, message, obj):
+        self.message = message
+        self.obj = obj
+        self.key = message.key, id(obj)
+
+    def __getattr__(self, name):
+        return getattr(self.message, name)
+
+    def accepts(self, obj):
+        return obj is self.obj and self.message.accepts(obj)
+
+    def task(self, obj, mailbox):
+        return self.message.task(obj, mailbox)
+
+    def fail(self, e):
+        self.message.fail(e)
+
+class ConsistentHash(FirstIdle):
+    '''Send each message to the worker that owns the hash of keyfunc applied to the message args, waiting for it if busy.
+    So messages about the same entity are always served by the same object.
+    Only workers that accept the message are on its ring, and a message whose args keyfunc can't take is routed as usual.'''
+
+    replicas = 64 # Points per worker on the ring.
+
+    def __init__(self, keyfunc):
+        self.keyfunc = keyfunc
+        self.rings = {}
+
+    def _ring(self, indices):
+        try:
+            return self.rings[indices]
+        except KeyError:
+            points = sorted((random.getrandbits(64), i) for i in indices for random in [Random(i)] for _ in range(self.replicas))
+            self.rings[indices] = ring = [h for h, _ in points], [i for _, i in points]
+            return ring
+
+    def prepare(self, workers, message):
+        try:
+            args, kwargs = message.args, message.kwargs
+        except AttributeError: # Not a call, for example a coroutine resumption.
+            return message
+        try:
+            h = hash(self.keyfunc(*args, **kwargs)) * 0x9e3779b97f4a7c15 & 0xffffffffffffffff # Spread out small ints.
+        except TypeError: # Args don't fit keyfunc, or the key is unhashable.
+            return message
+        indices = tuple(i for i, w in enumerate(workers) if w.accepts(message))
+        if not indices:
+            return message
+        hashes, owners = self._ring(indices)
+        return Sticky(message, workers[owners[bisect(hashes, h) % len(hashes)]].obj)
@@ -0,0 +1,363 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+'Post messages into an actor from another process, with large payloads passed through shared memory rather than copied through a pipe.'
+from . import proxy
+from .future import AbruptOutcome
+from functools import partial
+from itertools import count
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+from threading import Lock, Thread
+import logging, mmap, os, pickle, struct, time
+
+try:
+    import _posixshmem
+except ImportError:
+    _posixshmem = None
+
+log = logging.getLogger(__name__)
+headersize = 16 # Head then tail.
+length = struct.Struct('=I')
+
+class Attachment:
+    'Segment opened by name without registering with the resource tracker, as only its creator should unlink it.'
+
+    def __init__(self, name):
+        fd = _posixshmem.shm_open('/' + name, os.O_RDWR, mode = 0o600)
+        try:
+            self.mmap = mmap.mmap(fd, os.fstat(fd).st_size)
+        finally:
+            os.close(fd)
+        self.buf = memoryview(self.mmap)
+
+    def close(self):
+        self.buf.release()
+        self.mmap.close()
+
+def _attach(name):
+    if _posixshmem is None: # Windows has no resource tracker for these.
+        return shared_memory.SharedMemory(name)
+    return Attachment(name)
+
+def _backoff():
+    t = 1e-5
+    while True:
+        yield
+        time.sleep(t)
+        t = min(t * 2, .001)
+
+class Ring:
+    'Single-producer single-consumer ring of byte frames in shared memory.'
+
+    def __init__(self, shm):
+        self.shm = shm
+        self.buf = shm.buf
+        self.counters = self.buf[:headersize].cast('Q') # Native and aligned so each is read and written whole, unlike with struct.
+        self.capacity = len(self.buf) - headersize
+
+    @classmethod
+    def create(cls, capacity):
+        ring = cls(shared_memory.SharedMemory(create = True, size = headersize + capacity))
+        ring.counters[0] = ring.counters[1] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach(name))
+
+    def _copyin(self, pos, data):
+        i = pos % self.capacity
+        n = min(len(data), self.capacity - i)
+        self.buf[headersize + i:headersize + i + n] = data[:n]
+        self.buf[headersize:headersize + len(data) - n] = data[n:]
+
+    def _copyout(self, pos, n):
+        i = pos % self.capacity
+        m = min(n, self.capacity - i)
+        return bytes(self.buf[headersize + i:headersize + i + m]) + bytes(self.buf[headersize:headersize + n - m])
+
+    def put(self, data, closed = lambda: False):
+        size = length.size + len(data)
+        if size > self.capacity:
+            raise ValueError(f"Frame of {len(data)} bytes too big for ring of {self.capacity}.")
+        for _ in _backoff():
+            head, tail = self.counters
+            if head - tail + size <= self.capacity:
+                break
+            if closed():
+                raise EOFError('Ring closed while full.')
+        self._copyin(head, length.pack(len(data)))
+        self._copyin(head + length.size, data)
+        self.counters[0] = head + size # Publish only after the frame is written.
+
+    def get(self, closed):
+        '''Return the next frame, or None once closed returns true while waiting.
+        There is no blocking wakeup, an idle reader polls with backoff up to 1ms.'''
+        for _ in _backoff():
+            head, tail = self.counters
+            if head != tail:
+                break
+            if closed():
+                return
+        n, = length.unpack(self._copyout(tail, length.size))
+        data = self._copyout(tail + length.size, n)
+        self.counters[1] = tail + length.size + n
+        return data
+
+    def close(self):
+        self.counters.release()
+        self.buf = None
+        self.shm.close()
+
+class Handle:
+    'Pickled in place of a payload that lives in a shared memory segment.'
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+class Block:
+    'Writable shared memory for building a payload in place, pass it as a message arg to avoid any copy.'
+
+    def __init__(self, producer, size):
+        self.producer = producer
+        self.shm = shared_memory.SharedMemory(create = True, size = max(size, 1))
+        self.size = size
+        self.buf = self.shm.buf[:size]
+        self.refs = 1
+
+    def release(self):
+        'Give up our own reference, the segment is freed once no pending message uses it either.'
+        self.producer._decref([self])
+
+class Producer:
+    '''Client end of a Channel, any number of which may be attached from any processes. Acts as a mailbox, see actor.
+    Each has its own pair of rings of the given capacity, so message and reply frames must fit in that.'''
+
+    threshold = 64 * 1024 # Bytes-like args at least this big are put in shared memory.
+
+    def __init__(self, address, capacity = 1 << 20):
+        self.requests = Ring.create(capacity)
+        self.replies = Ring.create(capacity)
+        self.conn = Client(address)
+        self.conn.send((self.requests.shm.name, self.replies.shm.name))
+        self.lock = Lock()
+        self.putlock = Lock()
+        self.msgids = count()
+        self.pending = {}
+        self.broken = None
+        self.closed = False
+        self.reader = Thread(target = self._read, daemon = True)
+        self.reader.start()
+
+    def _gone(self):
+        return self.closed or self.conn.poll() # The channel never sends, so readable means it has gone.
+
+    def allocate(self, size):
+        return Block(self, size)
+
+    def actor(self):
+        'Return a proxy for the actor behind the channel, that posts via this producer.'
+        return proxy(self, 'ChannelActor')
+
+    def _share(self, obj, blocks):
+        if isinstance(obj, Block):
+            block = obj
+            block.refs += 1
+        elif isinstance(obj, (bytes, bytearray, memoryview)) and memoryview(obj).nbytes >= self.threshold:
+            block = Block(self, memoryview(obj).nbytes)
+            block.buf[:] = memoryview(obj).cast('B')
+        else:
+            return obj
+        blocks.append(block)
+        return Handle(block.shm.name, block.size)
+
+    def add(self, message):
+        blocks = []
+        msgid = None
+        try:
+            with self.lock:
+                outcome = self.broken
+                if outcome is None:
+                    args = [self._share(a, blocks) for a in message.args]
+                    kwargs = {k: self._share(v, blocks) for k, v in message.kwargs.items()}
+                    msgid = next(self.msgids)
+                    self.pending[msgid] = message.future, blocks
+            if outcome is None:
+                data = pickle.dumps((msgid, message.methodname, args, kwargs, message.deadline, message.priority), pickle.HIGHEST_PROTOCOL)
+                with self.putlock: # Not self.lock, which the reader needs to drain replies while we wait for space.
+                    self.requests.put(data, self._gone)
+                return
+        except BaseException as e:
+            outcome = AbruptOutcome(e)
+        with self.lock:
+            if msgid is not None and self.pending.pop(msgid, None) is None:
+                return # The reader has already failed it.
+        self._decref(blocks)
+        message.future.set(outcome)
+
+    def _decref(self, blocks):
+        for block in blocks:
+            with self.lock:
+                block.refs -= 1
+                if block.refs:
+                    continue
+            block.buf.release()
+            block.shm.close()
+            block.shm.unlink()
+
+    def _read(self):
+        while True:
+            data = self.replies.get(self._gone)
+            if data is None:
+                break
+            msgid, outcome = pickle.loads(data)
+            with self.lock:
+                future, blocks = self.pending.pop(msgid)
+            self._decref(blocks)
+            future.set(outcome)
+        with self.lock:
+            if self.broken is None:
+                self.broken = AbruptOutcome(EOFError('Producer closed.' if self.closed else 'Channel has gone.'))
+            pending, self.pending = self.pending, {}
+        for future, blocks in pending.values():
+            self._decref(blocks)
+            future.set(self.broken)
+
+    def close(self):
+        self.closed = True
+        self.reader.join()
+        self.conn.close() # Tells the channel we're gone.
+        for ring in self.requests, self.replies:
+            ring.close()
+            ring.shm.unlink()
+
+class Session:
+    'Channel end of the rings of one Producer.'
+
+    def __init__(self, channel, conn, requestname, replyname):
+        self.channel = channel
+        self.conn = conn
+        self.requests = Ring.attach(requestname)
+        self.replies = Ring.attach(replyname)
+        self.lock = Lock()
+        self.inflight = 0
+        self.ended = False
+        self.reader = Thread(target = self._read, daemon = True)
+        self.reader.start()
+
+    def _closed(self):
+        return self.channel.closed or self.conn.poll() # The producer never sends more, so readable means it has gone.
+
+    def _read(self):
+        while True:
+            data = self.requests.get(self._closed)
+            if data is None:
+                break
+            msgid, methodname, args, kwargs, deadline, priority = pickle.loads(data)
+            segments = []
+            args = [self.channel._open(a, segments) for a in args]
+            kwargs = {k: self.channel._open(v, segments) for k, v in kwargs.items()}
+            post = getattr(self.channel.actor, methodname).at(priority)
+            if deadline is not None:
+                post = post.within(deadline - time.monotonic())
+            with self.lock:
+                self.inflight += 1
+            post(*args, **kwargs).listenoutcome(partial(self._reply, msgid, segments))
+        with self.lock:
+            self.ended = True
+            self._tidy()
+
+    def _reply(self, msgid, segments, outcome):
+        for shm, view in segments:
+            try:
+                view.release()
+                shm.close()
+            except BufferError: # The method kept an export of its payload, such as from numpy.frombuffer.
+                log.warning("Segment still referenced after %s completed, leaving it to the garbage collector.", msgid)
+        try:
+            data = pickle.dumps((msgid, outcome), pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            try:
+                data = pickle.dumps((msgid, AbruptOutcome(e)), pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                data = pickle.dumps((msgid, AbruptOutcome(RuntimeError(f"Unpicklable outcome: {e!r}"))), pickle.HIGHEST_PROTOCOL)
+        with self.lock: # Must not raise, as we are an outcome listener on the actor's thread.
+            try:
+                if not self.ended:
+                    try:
+                        self.replies.put(data, self._closed)
+                    except ValueError as e: # Too big for the ring.
+                        self.replies.put(pickle.dumps((msgid, AbruptOutcome(e)), pickle.HIGHEST_PROTOCOL), self._closed)
+            except Exception:
+                log.debug("Dropped reply %s as producer has gone.", msgid, exc_info = True)
+            finally:
+                self.inflight -= 1
+                self._tidy()
+
+    def _tidy(self):
+        if self.ended and not self.inflight:
+            for ring in self.requests, self.replies:
+                ring.close()
+            self.conn.close()
+
+class Channel:
+    '''Server end, in the actor's process. Messages posted by any Producer attached to our address are posted to the given actor.
+    Shared payloads arrive as read-only memoryviews valid until the method returns, or for coroutines until they complete.
+    A reply too big for the ring fails with ValueError, put big results in shared memory some other way.'''
+
+    def __init__(self, actor):
+        self.actor = actor
+        self.listener = Listener()
+        self.sessions = []
+        self.closed = False
+        self.acceptor = Thread(target = self._accept, daemon = True)
+        self.acceptor.start()
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def _accept(self):
+        while True:
+            conn = self.listener.accept()
+            if self.closed:
+                conn.close()
+                break
+            try:
+                names = conn.recv()
+            except EOFError:
+                conn.close()
+                continue
+            self.sessions.append(Session(self, conn, *names))
+
+    def _open(self, obj, segments):
+        if isinstance(obj, Handle):
+            shm = _attach(obj.name)
+            view = shm.buf[:obj.size].toreadonly()
+            segments.append((shm, view))
+            return view
+        return obj
+
+    def close(self):
+        self.closed = True
+        Client(self.address).close() # Wake the acceptor.
+        self.acceptor.join()
+        self.listener.close()
+        for session in self.sessions:
+            session.reader.join()
@@ -0,0 +1,75 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import Spawn
+from .aio import fromasyncio, fromconcurrent, toasyncio
+from .future import AbruptOutcome, Future, NormalOutcome
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from unittest import TestCase
+import asyncio
+
+class X(Exception):
+    pass
+
+def run(main):
+    loop = asyncio.new_event_loop() # Unlike asyncio.run this doesn't touch the current loop.
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+class TestAio(TestCase):
+
+    def test_toasyncio(self):
+        async def main():
+            f, g = Future(), Future()
+            Thread(target = f.set, args = [NormalOutcome(100)]).start()
+            g.set(AbruptOutcome(X()))
+            self.assertEqual(100, await toasyncio(f))
+            with self.assertRaises(X):
+                await toasyncio(g)
+        run(main)
+
+    def test_closedloop(self):
+        f = Future()
+        async def main():
+            toasyncio(f)
+        run(main)
+        f.set(NormalOutcome(100)) # Must not raise.
+        self.assertEqual(100, f.wait())
+
+    def test_actor(self):
+        class Obj:
+            async def m(self, k):
+                return await fromconcurrent(e.submit(lambda: k + 1)) + await fromasyncio(asyncio.sleep(0, k * 10), loop)
+        async def main():
+            nonlocal loop
+            loop = asyncio.get_running_loop()
+            a = Spawn(e)(Obj())
+            return await asyncio.gather(*(toasyncio(a.m(k)) for k in range(100)))
+        loop = None
+        with ThreadPoolExecutor() as e:
+            self.assertEqual([k * 11 + 1 for k in range(100)], run(main))
+
+    def test_fromconcurrentabrupt(self):
+        def fail():
+            raise X
+        with ThreadPoolExecutor() as e:
+            f = fromconcurrent(e.submit(fail))
+            with self.assertRaises(X):
+                f.wait()
@@ -0,0 +1,91 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import Spawn
+from .executor import ManualExecutor, StealingExecutor
+from threading import Event
+from unittest import TestCase
+import sys
+
+class Counter:
+
+    def __init__(self):
+        self.n = 0
+
+    def increment(self):
+        self.n += 1
+        return self.n
+
+class TestStealingExecutor(TestCase):
+
+    def test_spawn(self):
+        with StealingExecutor(4) as e:
+            spawn = Spawn(e)
+            counters = [Counter() for _ in range(20)]
+            actors = [spawn(c) for c in counters]
+            futures = [a.increment() for _ in range(50) for a in actors]
+            for f in futures:
+                f.wait()
+        self.assertEqual([50] * 20, [c.n for c in counters])
+
+    def test_steal(self):
+        with StealingExecutor(2) as e:
+            blocker, done, key = Event(), Event(), object()
+            e.submit(lambda key: blocker.wait(), key)
+            e.submit(lambda key: done.set(), key) # Same preferred thread, which is blocked.
+            self.assertTrue(done.wait(5))
+            blocker.set()
+
+    def test_wakeup(self):
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6) # Make a lost wakeup likely if there is one.
+        try:
+            with StealingExecutor(1) as e:
+                for _ in range(20000):
+                    done = Event()
+                    e.submit(done.set)
+                    self.assertTrue(done.wait(5))
+        finally:
+            sys.setswitchinterval(interval)
+
+    def test_shutdown(self):
+        results = []
+        with StealingExecutor(1) as e:
+            for k in range(10):
+                e.submit(results.append, k)
+        self.assertEqual(list(range(10)), results)
+        with self.assertRaises(RuntimeError):
+            e.submit(results.append, 10)
+
+    def test_log(self):
+        with self.assertLogs('splut.actor.executor') as cm, StealingExecutor(1) as e:
+            e.submit(lambda: 1 / 0)
+        self.assertEqual(1, len(cm.records))
+
+class TestManualExecutor(TestCase):
+
+    def test_run(self):
+        e = ManualExecutor()
+        v = []
+        e.submit(v.append, 1)
+        e.submit(lambda: e.submit(v.append, 3))
+        e.submit(v.append, 2)
+        self.assertEqual([], v)
+        self.assertEqual(4, e.run())
+        self.assertEqual([1, 2, 3], v)
+        self.assertEqual(0, e.run())
@@ -47,3 +47,64 @@ class TestFuture(TestCase):
         with self.assertRaises(X) as cm:
             f.wait()
         self.assertIs(cm.exception, x)
+
+    def test_allof(self):
+        f, g = Future(), Future()
+        a = Future.allof([f, g])
+        g.set(NormalOutcome(2))
+        self.assertIsNone(a.outcome)
+        f.set(NormalOutcome(1))
+        self.assertEqual([1, 2], a.wait())
+        self.assertEqual([], Future.allof([]).wait())
+
+    def test_allofabrupt(self):
+        class X(Exception):
+            pass
+        f, g = Future(), Future()
+        a = Future.allof([f, g])
+        f.set(AbruptOutcome(X()))
+        with self.assertRaises(X):
+            a.wait()
+        g.set(NormalOutcome(2))
+
+    def test_anyof(self):
+        class X(Exception):
+            pass
+        f, g, h = Future(), Future(), Future()
+        a = Future.anyof([f, g, h])
+        f.set(AbruptOutcome(X()))
+        self.assertIsNone(a.outcome)
+        g.set(NormalOutcome(2))
+        h.set(NormalOutcome(3))
+        self.assertEqual(2, a.wait())
+        f, g = Future(), Future()
+        a = Future.anyof([f, g])
+        f.set(AbruptOutcome(X()))
+        x = X()
+        g.set(AbruptOutcome(x))
+        with self.assertRaises(X) as cm:
+            a.wait()
+        self.assertIs(x, cm.exception)
+        with self.assertRaises(ValueError):
+            Future.anyof([]).wait(0)
+
+    def test_firstcompleted(self):
+        f, g = Future(), Future()
+        a = Future.firstcompleted([f, g])
+        g.set(AbruptOutcome(Exception()))
+        f.set(NormalOutcome(1))
+        self.assertIs(g, a.wait())
+        self.assertIsNone(Future.firstcompleted(iter([])).wait(0))
+
+    def test_timeout(self):
+        f = Future()
+        for _ in range(3):
+            with self.assertRaises(TimeoutError):
+                f.wait(.01)
+        self.assertIsNone(f.callbacks)
+        f.listenoutcome(lambda o: None)
+        with self.assertRaises(TimeoutError):
+            f.wait(0)
+        self.assertEqual(1, len(f.callbacks))
+        f.set(NormalOutcome(100))
+        self.assertEqual(100, f.wait(0))
@@ -0,0 +1,223 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import coalesce, Post
+from .executor import ManualExecutor
+from .future import Future
+from .mailbox import Block, DropOldest, Fail, Full, Mailbox
+from .message import Coro, nulloutcome
+from threading import Thread
+from unittest import TestCase
+
+class X:
+
+    def x(self, k):
+        return k
+
+class Y:
+
+    def y(self, k):
+        return k
+
+class TestMailbox(TestCase):
+
+    def setUp(self):
+        self.executor = ManualExecutor()
+        self.mailbox = Mailbox(self.executor, [X(), Y()])
+
+    def test_fifo(self):
+        xworker, yworker = self.mailbox.workers
+        fx = [Post(self.mailbox, 'x')(k) for k in range(3)]
+        fy = [Post(self.mailbox, 'y')(k) for k in range(3)]
+        self.assertEqual(2, len(self.executor.tasks))
+        self.assertEqual({(0, 'x'): 2, (0, 'y'): 2}, {k: len(q) for k, q in self.mailbox.queues.items()})
+        for _, (w, task) in self.executor.tasks:
+            task()
+        for _ in range(2):
+            self.mailbox._another(yworker)()
+            self.mailbox._another(xworker)()
+        self.assertIsNone(self.mailbox._another(xworker))
+        self.assertTrue(xworker.idle)
+        self.assertEqual({}, self.mailbox.queues)
+        self.assertEqual([0, 1, 2], [f.wait() for f in fx])
+        self.assertEqual([0, 1, 2], [f.wait() for f in fy])
+
+    def test_unknownmethod(self):
+        Post(self.mailbox, 'z')(0)
+        self.assertEqual([], self.executor.tasks)
+        self.assertEqual({'z': False}, self.mailbox.workers[0].keys)
+        self.assertIsNone(self.mailbox._another(self.mailbox.workers[0]))
+
+class TestPriority(TestCase):
+
+    def setUp(self):
+        self.executor = ManualExecutor()
+        self.mailbox = Mailbox(self.executor, [X()])
+        self.x = Post(self.mailbox, 'x')
+
+    def test_priority(self):
+        fs = [self.x(k) for k in range(4)]
+        fs.append(self.x.at(1)(4))
+        fs.append(self.x.at(2)(5))
+        order = []
+        for f in fs:
+            f.listenoutcome(lambda o: order.append(o.result()))
+        self.executor.run()
+        self.assertEqual([0, 5, 4, 1, 2, 3], order)
+
+    def test_aging(self):
+        self.mailbox.aging = 2.5
+        self.x(0)
+        fs = [self.x(k) for k in range(1, 5)]
+        fs.extend(self.x.at(1)(k) for k in range(5, 9))
+        order = []
+        for f in fs:
+            f.listenoutcome(lambda o: order.append(o.result()))
+        self.executor.run()
+        self.assertEqual([1, 2, 5, 3, 6, 4, 7, 8], order)
+
+class TestCapacity(TestCase):
+
+    def _mailbox(self, policy, capacity = 2):
+        self.executor = ManualExecutor()
+        self.mailbox = Mailbox(self.executor, [X()], capacity, policy)
+        self.x = Post(self.mailbox, 'x')
+        futures = [self.x(k) for k in range(capacity + 1)]
+        (_, (self.worker, task)), = self.executor.tasks
+        task()
+        return futures
+
+    def _drain(self, n = -1):
+        while n:
+            task = self.mailbox._another(self.worker)
+            if task is None:
+                break
+            task()
+            n -= 1
+
+    def test_fail(self):
+        f, g, h = self._mailbox(Fail())
+        self.assertEqual(2, self.mailbox.depth)
+        with self.assertRaises(Full):
+            self.x(3).wait()
+        self._drain()
+        self.assertEqual([0, 1, 2], [f.wait(), g.wait(), h.wait()])
+        self.assertEqual(0, self.mailbox.depth)
+
+    def test_dropoldest(self):
+        f, g, h = self._mailbox(DropOldest())
+        i = self.x(3)
+        with self.assertRaises(Full):
+            g.wait()
+        self._drain()
+        self.assertEqual([0, 2, 3], [f.wait(), h.wait(), i.wait()])
+
+    def test_dropoldestresumption(self):
+        self.mailbox = Mailbox(ManualExecutor(), [X()], 1, DropOldest())
+        self.x = Post(self.mailbox, 'x')
+        f = self.x(0)
+        worker, = self.mailbox.workers
+        self.mailbox.add(Coro.Message(Coro(worker.obj, None, Future()), nulloutcome)) # Queued as the worker is busy.
+        self.assertEqual(1, self.mailbox.depth)
+        with self.assertRaises(Full):
+            self.x(1).wait()
+        self.assertEqual(1, self.mailbox.depth)
+        self.assertIsNone(f.outcome)
+
+    def test_blocktimeout(self):
+        self._mailbox(Block(.01))
+        with self.assertRaises(Full):
+            self.x(3).wait()
+
+    def test_blocktimeoutoverall(self):
+        self._mailbox(Block(.2))
+        futures = []
+        t = Thread(target = lambda: futures.append(self.x(3)))
+        t.start()
+        for _ in range(20): # Wakeups without space mustn't restart the timeout.
+            t.join(.05)
+            with self.mailbox.lock:
+                self.mailbox.space.notify()
+        self.assertFalse(t.is_alive())
+        with self.assertRaises(Full):
+            futures[0].wait()
+
+    def test_block(self):
+        futures = self._mailbox(Block())
+        t = Thread(target = lambda: futures.append(self.x(3)))
+        t.start()
+        t.join(.05)
+        self.assertTrue(t.is_alive())
+        self._drain(1)
+        t.join()
+        self.assertEqual(2, self.mailbox.depth)
+        self._drain()
+        self.assertEqual([0, 1, 2, 3], [f.wait() for f in futures])
+
+class Refresher:
+
+    def __init__(self):
+        self.refreshed = []
+
+    @coalesce
+    def refresh(self, key, deep = False):
+        self.refreshed.append((key, deep))
+        return len(self.refreshed)
+
+    def other(self, key):
+        return key
+
+class TestCoalesce(TestCase):
+
+    def setUp(self):
+        self.executor = ManualExecutor()
+        self.mailbox = Mailbox(self.executor, [Refresher()])
+        self.refresh = Post(self.mailbox, 'refresh')
+        self.other = Post(self.mailbox, 'other')
+
+    def test_coalesce(self):
+        busy = self.other(0)
+        a = [self.refresh('a') for _ in range(3)]
+        b = self.refresh('b')
+        c = [self.refresh('a', deep = True) for _ in range(2)]
+        d = [self.refresh(['unhashable']) for _ in range(2)]
+        e = [self.other(1) for _ in range(2)]
+        self.assertEqual(7, self.mailbox.depth)
+        self.assertEqual(1, self.executor.run())
+        self.assertEqual(0, busy.wait())
+        self.assertEqual([1, 1, 1], [f.wait() for f in a])
+        self.assertEqual(2, b.wait())
+        self.assertEqual([3, 3], [f.wait() for f in c])
+        self.assertEqual([4, 5], [f.wait() for f in d])
+        self.assertEqual([1, 1], [f.wait() for f in e])
+        self.assertEqual({}, self.mailbox.coalesced)
+        f = self.refresh('a') # Nothing queued to merge with.
+        self.assertEqual(1, self.executor.run())
+        self.assertEqual(6, f.wait())
+
+    def test_prioritydeadline(self):
+        self.other(0)
+        futures = [self.refresh('a'), self.refresh.at(1)('a'), self.refresh.within(60)('a'), self.refresh('a')]
+        self.assertEqual(3, self.mailbox.depth) # Only the last is merged.
+        self.executor.run()
+        self.assertEqual([2, 1, 3, 2], [f.wait() for f in futures])
+
+    def test_started(self):
+        f = self.refresh('a')
+        g = self.refresh('a') # Not merged as the first has started.
+        self.executor.run()
+        self.assertEqual([1, 2], [f.wait(), g.wait()])
@@ -0,0 +1,65 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import Spawn
+from .metrics import Histogram, Metrics
+from .route import ConsistentHash
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+class Echo:
+
+    def echo(self, x):
+        return x
+
+    async def twice(self, other):
+        return await other.echo(1) + await other.echo(2)
+
+class TestMetrics(TestCase):
+
+    def test_histogram(self):
+        h = Histogram((1, 10))
+        for v in 0, 1, 2, 10, 11, 100:
+            h.record(v)
+        self.assertEqual(dict(bounds = (1, 10), counts = [2, 2, 2], total = 124), h.snapshot())
+
+    def test_spawn(self):
+        metrics = Metrics()
+        with ThreadPoolExecutor() as e:
+            spawn = Spawn(e, metrics = metrics)
+            a, b = spawn(Echo()), spawn(Echo())
+            for k in range(10):
+                a.echo(k).wait()
+            self.assertEqual(3, a.twice(b).wait())
+        snapshot = metrics.snapshot()
+        self.assertEqual(['EchoActor'], list(snapshot))
+        actor = snapshot['EchoActor']
+        self.assertEqual(15, sum(actor['depth']['counts'])) # Including resumptions.
+        echo, twice = (actor['methods'][name] for name in ['echo', 'twice'])
+        self.assertEqual(12, sum(echo['wait']['counts']))
+        self.assertEqual(12, sum(echo['service']['counts']))
+        self.assertEqual(0, echo['suspensions'])
+        self.assertEqual(3, sum(twice['service']['counts']))
+        self.assertEqual(2, twice['suspensions'])
+
+    def test_route(self):
+        metrics = Metrics()
+        with ThreadPoolExecutor() as e:
+            a = Spawn(e, route = ConsistentHash(lambda x: x), metrics = metrics)(Echo(), Echo())
+            self.assertEqual(list(range(10)), [f.wait() for f in [a.echo(k) for k in range(10)]])
+        self.assertEqual(10, sum(metrics.snapshot()['EchoActor']['methods']['echo']['service']['counts']))
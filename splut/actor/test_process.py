@@ -0,0 +1,82 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from .process import ProcessSpawn
+from unittest import TestCase
+import os
+
+class X(Exception):
+    pass
+
+class Obj:
+
+    def __init__(self, k):
+        self.k = k
+
+    def pid(self):
+        return os.getpid()
+
+    def plus(self, j):
+        self.k += j
+        return self.k
+
+    def fail(self):
+        raise X('woo')
+
+    async def twice(self, j):
+        return await self.double(j)
+
+    def unpicklable(self):
+        return lambda: None
+
+    def double(self, j):
+        from .future import Future, NormalOutcome
+        f = Future()
+        f.set(NormalOutcome(j * 2))
+        return f
+
+class Bad:
+
+    def __init__(self):
+        raise X('bad')
+
+class TestProcessSpawn(TestCase):
+
+    def test_works(self):
+        with ProcessSpawn() as spawn:
+            self.assertNotEqual('fork', spawn.context.get_start_method())
+            a = spawn(Obj, 100)
+            b = spawn(Obj, k = 200)
+            self.assertEqual('ObjActor', type(a).__name__)
+            self.assertEqual([101, 103, 106], [f.wait() for f in [a.plus(k) for k in range(1, 4)]])
+            self.assertEqual(201, b.plus(1).wait())
+            self.assertEqual(3, len({os.getpid(), a.pid().wait(), b.pid().wait()}))
+            with self.assertRaises(X) as cm:
+                a.fail().wait()
+            self.assertEqual(('woo',), cm.exception.args)
+            self.assertEqual(10, a.twice(5).wait())
+            with self.assertRaises(Exception):
+                a.unpicklable().wait()
+            with self.assertRaises(Exception):
+                a.plus(lambda: None).wait()
+            self.assertEqual(107, a.plus(1).wait())
+
+    def test_badfactory(self):
+        with ProcessSpawn() as spawn:
+            a = spawn(Bad)
+            with self.assertRaises(X):
+                a.anything().wait()
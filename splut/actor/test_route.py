@@ -0,0 +1,97 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from . import Post
+from .executor import ManualExecutor
+from .mailbox import Mailbox
+from .route import ConsistentHash, LeastRecentlyUsed, RoundRobin
+from unittest import TestCase
+
+class Cache:
+
+    def __init__(self, name):
+        self.name = name
+
+    def get(self, entity):
+        return self.name, entity
+
+    def clear(self):
+        return self.name
+
+class Store:
+
+    def put(self, entity):
+        return entity
+
+class TestRoute(TestCase):
+
+    def _mailbox(self, route, objs = None):
+        self.executor = ManualExecutor()
+        mailbox = Mailbox(self.executor, [Cache(name) for name in 'abc'] if objs is None else objs, route = route)
+        self.get = Post(mailbox, 'get')
+        return mailbox
+
+    def _finish(self, mailbox, worker):
+        self.assertIsNone(mailbox._another(worker))
+
+    def _names(self):
+        return [args[0].obj.name for _, args in self.executor.tasks]
+
+    def test_roundrobin(self):
+        mailbox = self._mailbox(RoundRobin())
+        a, b, c = mailbox.workers
+        self.get(0)
+        self._finish(mailbox, a)
+        self.get(1)
+        self._finish(mailbox, b)
+        self.get(2)
+        self.get(3)
+        self.assertEqual(['a', 'b', 'c', 'a'], self._names())
+
+    def test_lru(self):
+        mailbox = self._mailbox(LeastRecentlyUsed())
+        a, b, c = mailbox.workers
+        self.get(0)
+        self.get(1)
+        self._finish(mailbox, a)
+        self.get(2)
+        self.assertEqual(['a', 'b', 'c'], self._names())
+
+    def test_consistenthash(self):
+        mailbox = self._mailbox(ConsistentHash(lambda entity: entity))
+        futures = [self.get(k % 10) for k in range(30)]
+        self.executor.run()
+        owners = {}
+        for f in futures:
+            name, entity = f.wait()
+            self.assertEqual(owners.setdefault(entity, name), name)
+        self.assertEqual({'a', 'b', 'c'}, set(owners.values()))
+        self.assertEqual({}, mailbox.queues)
+
+    def test_consistenthashfallback(self):
+        mailbox = self._mailbox(ConsistentHash(lambda entity: entity))
+        f = Post(mailbox, 'clear')() # No entity, so any worker will do.
+        self.assertEqual(1, self.executor.run())
+        self.assertEqual('a', f.wait())
+
+    def test_consistenthashaccepting(self):
+        mailbox = self._mailbox(ConsistentHash(lambda entity: entity), [Store(), Cache('a'), Store(), Cache('b')])
+        futures = [self.get(k) for k in range(20)]
+        self.executor.run()
+        self.assertEqual({'a', 'b'}, {f.wait()[0] for f in futures})
+        self.assertEqual({}, mailbox.queues)
@@ -0,0 +1,145 @@
+# Copyright 2014, 2018, 2019, 2020 Andrzej Cichocki
+
+# This file is part of splut.
+#
+# splut is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# splut is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with splut.  If not, see <http://www.gnu.org/licenses/>.
+
+from . import Spawn
+from .shm import Channel, Producer
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+from unittest import TestCase
+import pickle, time
+
+class Obj:
+
+    def digest(self, data, tail = b''):
+        return type(data).__name__, len(data), bytes(data[:3]), bytes(tail[-2:])
+
+    def fail(self):
+        raise KeyError('woo')
+
+    def echo(self, data):
+        return bytes(data)
+
+    def keep(self, data):
+        self.kept = pickle.PickleBuffer(data) # Holds an export of the payload, like numpy.frombuffer.
+        return len(data)
+
+    def sleep(self, t):
+        time.sleep(t)
+
+def serve(q):
+    e = ThreadPoolExecutor()
+    q.put(Channel(Spawn(e)(Obj())).address)
+    time.sleep(60)
+
+def produce(address, q):
+    p = Producer(address)
+    try:
+        q.put(p.actor().digest(b'x' * 100000).wait())
+    finally:
+        p.close()
+
+class TestChannel(TestCase):
+
+    def setUp(self):
+        self.e = ThreadPoolExecutor()
+        self.channel = Channel(Spawn(self.e)(Obj()))
+
+    def tearDown(self):
+        self.channel.close()
+        self.e.shutdown()
+
+    def test_works(self):
+        p = Producer(self.channel.address, 4096)
+        try:
+            a = p.actor()
+            self.assertEqual(('bytes', 3, b'abc', b''), a.digest(b'abc').wait())
+            self.assertEqual(('memoryview', 100000, b'\0\0\0', b'yz'), a.digest(bytes(100000), tail = b'y' * 70000 + b'z').wait())
+            block = p.allocate(5)
+            block.buf[:] = b'hello'
+            self.assertEqual(('memoryview', 5, b'hel', b''), a.digest(block).wait())
+            self.assertEqual(('memoryview', 5, b'hel', b''), a.digest(block).wait())
+            self.assertEqual(1, block.refs)
+            block.release()
+            with self.assertRaises(KeyError):
+                a.fail().wait()
+            with self.assertRaises(ValueError):
+                a.digest(b'x' * 5000).wait() # Too big for the ring but under the threshold.
+            futures = [a.digest(bytes([k]) * 100) for k in range(200)]
+            self.assertEqual([('bytes', 100, bytes([k]) * 3, b'') for k in range(200)], [f.wait() for f in futures])
+            self.assertEqual({}, p.pending)
+        finally:
+            p.close()
+
+    def test_bigreply(self):
+        p = Producer(self.channel.address, 4096)
+        try:
+            a = p.actor()
+            with self.assertRaises(ValueError):
+                a.echo(b'x' * 100000).wait(10) # Arg is shared but the result is too big for the ring.
+            self.assertEqual(b'ok', a.echo(b'ok').wait(10))
+        finally:
+            p.close()
+
+    def test_keptpayload(self):
+        p = Producer(self.channel.address)
+        try:
+            a = p.actor()
+            self.assertEqual(100000, a.keep(bytes(100000)).wait(10))
+            self.assertEqual(b'ok', a.echo(b'ok').wait(10))
+        finally:
+            p.close()
+
+    def test_channelgone(self):
+        context = get_context('spawn')
+        q = context.Queue()
+        process = context.Process(target = serve, args = [q], daemon = True)
+        process.start()
+        try:
+            p = Producer(q.get(timeout = 10))
+            try:
+                a = p.actor()
+                self.assertIsNone(a.sleep(0).wait(10))
+                f = a.sleep(60)
+                process.kill()
+                with self.assertRaises(EOFError):
+                    f.wait(10)
+                with self.assertRaises(EOFError):
+                    a.sleep(0).wait(10)
+                self.assertEqual({}, p.pending)
+            finally:
+                p.close()
+        finally:
+            process.kill()
+            process.join()
+
+    def test_manyproducers(self):
+        producers = [Producer(self.channel.address, 4096) for _ in range(3)]
+        try:
+            futures = [(i, k, p.actor().digest(bytes([i, k]))) for i, p in enumerate(producers) for k in range(100)]
+            for i, k, f in futures:
+                self.assertEqual(('bytes', 2, bytes([i, k]), b''), f.wait(10))
+        finally:
+            for p in producers:
+                p.close()
+
+    def test_otherprocess(self):
+        context = get_context()
+        q = context.Queue()
+        process = context.Process(target = produce, args = (self.channel.address, q))
+        process.start()
+        self.assertEqual(('memoryview', 100000, b'xxx', b''), q.get(timeout = 10))
+        process.join()
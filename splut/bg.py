@@ -15,11 +15,21 @@
 # You should have received a copy of the GNU General Public License
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
+from collections import Counter
 from concurrent.futures import Future
 from functools import partial
-import logging, os, tempfile, threading, time
+import dis, logging, os, sys, tempfile, threading, time
 
 log = logging.getLogger(__name__)
+resumeop = dis.opmap.get('RESUME')
+
+def _called(frame):
+    'Whether a call trace event is a real call rather than a generator or coroutine resuming.'
+    i = frame.f_lasti
+    if resumeop is None:
+        return i < 0
+    code = frame.f_code.co_code
+    return code[i] == resumeop and not code[i + 1] & 3
 
 class Quit:
 
@@ -97,14 +107,217 @@ class Profile:
                 stats.sort_stats(self.sort)
                 stats.print_stats()
 
+class Sample:
+    '''Alternative to Profile that samples stacks every interval seconds, so it can be used under real load.
+    Samples the target thread and any thread whose name starts with one of the prefixes, such as actor worker threads.
+    Folded stacks as consumed by flamegraph.pl are rewritten every flush seconds and when the target returns.'''
+
+    def __init__(self, interval = .01, flush = 10, stem = 'sample', prefixes = ('ThreadPoolExecutor', 'StealingExecutor')):
+        self.interval = interval
+        self.flush = flush
+        self.stem = stem
+        self.prefixes = prefixes
+
+    def __call__(self, target, *args, **kwargs):
+        path = "%s.%s.%s.folded" % (self.stem, time.strftime('%Y-%m-%dT%H-%M-%S'), threading.current_thread().name)
+        stacks = Counter()
+        stop = threading.Event()
+        sampler = threading.Thread(name = f"{threading.current_thread().name}Sampler", target = self._sample, args = (threading.get_ident(), stacks, stop, path), daemon = True)
+        sampler.start()
+        try:
+            return target(*args, **kwargs)
+        finally:
+            stop.set()
+            sampler.join()
+
+    def _sample(self, targetident, stacks, stop, path):
+        flushtime = time.monotonic() + self.flush
+        while not stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate() if t.ident == targetident or t.name.startswith(self.prefixes)}
+            for ident, frame in sys._current_frames().items():
+                try:
+                    name = names[ident]
+                except KeyError:
+                    continue
+                labels = []
+                while frame is not None:
+                    code = frame.f_code
+                    labels.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                labels.append(name)
+                stacks[';'.join(reversed(labels))] += 1
+            if time.monotonic() >= flushtime:
+                self._write(stacks, path)
+                flushtime += self.flush
+        self._write(stacks, path)
+
+    def _write(self, stacks, path):
+        tmppath = f"{path}.part"
+        with open(tmppath, 'w') as f:
+            for stack, n in stacks.items():
+                print(stack, n, file = f)
+        os.replace(tmppath, path)
+
+class Instrument:
+    '''Record line coverage and per function calls and inclusive seconds of code in modules having any of the given prefixes, writing a report when the target returns.
+    Uses sys.monitoring where available, so lines already covered and code outside the prefixes cost next to nothing, otherwise sys.settrace.'''
+
+    def __init__(self, prefixes, stem = 'instrument'):
+        self.prefixes = prefixes
+        self.stem = stem
+
+    def __call__(self, target, *args, **kwargs):
+        path = "%s.%s.%s" % (self.stem, time.strftime('%Y-%m-%dT%H-%M-%S'), threading.current_thread().name)
+        self.filematches = {}
+        self.lines = {}
+        self.timings = {}
+        self.local = threading.local()
+        try:
+            monitoring = sys.monitoring
+        except AttributeError:
+            run = self._settrace
+        else:
+            run = partial(self._monitor, monitoring)
+        try:
+            return run(target, args, kwargs)
+        finally:
+            self._write(path)
+
+    def _matches(self, code):
+        filename = code.co_filename
+        try:
+            return self.filematches[filename]
+        except KeyError:
+            pass
+        for name, module in list(sys.modules.items()):
+            if getattr(module, '__file__', None) == filename:
+                matches = any(name == p or name.startswith(f"{p}.") for p in self.prefixes)
+                break
+        else:
+            matches = False
+        self.filematches[filename] = matches
+        return matches
+
+    def _stack(self):
+        try:
+            return self.local.stack
+        except AttributeError:
+            self.local.stack = stack = []
+            return stack
+
+    def _enter(self, code, call):
+        t = self.timings.get(code)
+        if t is None:
+            self.timings[code] = t = [0, 0.]
+        if call:
+            t[0] += 1
+        self._stack().append((t, time.perf_counter()))
+
+    def _exit(self):
+        stack = self._stack()
+        if stack:
+            t, start = stack.pop()
+            t[1] += time.perf_counter() - start
+
+    def _line(self, code, line):
+        try:
+            self.lines[code.co_filename].add(line)
+        except KeyError:
+            self.lines[code.co_filename] = {line}
+
+    def _monitor(self, monitoring, target, args, kwargs):
+        E = monitoring.events
+        disable = monitoring.DISABLE
+        def start(code, offset):
+            if not self._matches(code):
+                return disable
+            self._enter(code, True)
+        def resume(code, offset):
+            if not self._matches(code):
+                return disable
+            self._enter(code, False)
+        def exit(code, offset, obj):
+            if not self._matches(code):
+                return disable
+            self._exit()
+        def throw(code, offset, e): # Can't be disabled.
+            if self._matches(code):
+                self._enter(code, False)
+        def unwind(code, offset, e): # Can't be disabled.
+            if self._matches(code):
+                self._exit()
+        def line(code, line):
+            if self._matches(code):
+                self._line(code, line)
+            return disable # Once is enough for coverage.
+        callbacks = {E.PY_START: start, E.PY_RESUME: resume, E.PY_THROW: throw, E.PY_RETURN: exit, E.PY_YIELD: exit, E.PY_UNWIND: unwind, E.LINE: line}
+        for tool in monitoring.PROFILER_ID, *range(6): # cProfile or another Instrument may hold the usual one.
+            try:
+                monitoring.use_tool_id(tool, __name__)
+                break
+            except ValueError:
+                pass
+        else:
+            log.warning('No free sys.monitoring tool id, falling back to settrace.')
+            return self._settrace(target, args, kwargs)
+        try:
+            for event, f in callbacks.items():
+                monitoring.register_callback(tool, event, f)
+            monitoring.restart_events() # Undo any DISABLE from a previous run.
+            monitoring.set_events(tool, sum(callbacks))
+            try:
+                return target(*args, **kwargs)
+            finally:
+                monitoring.set_events(tool, 0)
+                for event in callbacks:
+                    monitoring.register_callback(tool, event, None)
+        finally:
+            monitoring.free_tool_id(tool)
+
+    def _settrace(self, target, args, kwargs):
+        def local(frame, event, arg):
+            if 'line' == event:
+                self._line(frame.f_code, frame.f_lineno)
+            elif 'return' == event:
+                self._exit()
+            return local
+        def trace(frame, event, arg):
+            if self._matches(frame.f_code):
+                self._enter(frame.f_code, _called(frame))
+                return local
+        threading.settrace(trace)
+        sys.settrace(trace)
+        try:
+            return target(*args, **kwargs)
+        finally:
+            sys.settrace(None)
+            threading.settrace(None)
+
+    def _write(self, path):
+        def ranges(lines):
+            starts = [n for n in sorted(lines) if n - 1 not in lines]
+            ends = [n for n in sorted(lines) if n + 1 not in lines]
+            return ','.join(str(a) if a == b else f"{a}-{b}" for a, b in zip(starts, ends))
+        with open(path, 'w') as f:
+            print('calls seconds function', file = f)
+            for code, (calls, seconds) in sorted(self.timings.items(), key = lambda item: -item[1][1]):
+                print(calls, f"{seconds:.6f}", f"{code.co_filename}:{code.co_firstlineno}({getattr(code, 'co_qualname', code.co_name)})", file = f)
+            print(file = f)
+            print('file lines', file = f)
+            for filename, lines in sorted(self.lines.items()):
+                print(filename, ranges(lines), file = f)
+
 class MainBackground(SimpleBackground):
 
     def __init__(self, config):
         super().__init__(config.profile)
         if config.trace:
             if config.profile:
-                raise Exception # XXX: Can they really not be combined?
-            self.bg = self.trace
+                if not isinstance(config.profile, Instrument): # Do both at once, by default for the package of the subclass:
+                    self.profile = Instrument(getattr(config, 'prefixes', None) or [type(self).__module__.partition('.')[0]], getattr(config.profile, 'stem', 'instrument'))
+                self.bg = self
+            else:
+                self.bg = self.trace
         else:
             self.bg = self
 
@@ -16,13 +16,29 @@
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
 from .bg import SimpleBackground, Sleeper
-from collections import namedtuple
-import heapq, logging, threading, time
+from itertools import count
+import heapq, logging, math, threading, time
 
 log = logging.getLogger(__name__)
 
 # The taskindex ensures task objects are never compared:
-class Task(namedtuple('BaseTask', 'when taskindex task')):
+class Task:
+
+    __slots__ = 'when', 'taskindex', 'task', 'pending'
+
+    def __init__(self, when, taskindex, task):
+        self.when = when
+        self.taskindex = taskindex
+        self.task = task
+        self.pending = True
+
+    def __lt__(self, that):
+        return (self.when, self.taskindex) < (that.when, that.taskindex)
+
+    def __iter__(self): # Unpacks like the namedtuple this used to be.
+        yield self.when
+        yield self.taskindex
+        yield self.task
 
     def __call__(self):
         try:
@@ -30,13 +46,304 @@ class Task(namedtuple('BaseTask', 'when taskindex task')):
         except Exception:
             log.exception('Task failed:')
 
+class Lateness:
+    '''Statistics of seconds between when tasks were due and when they actually started.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def mean(self):
+        with self.lock:
+            if self.count:
+                return self.total / self.count
+
+class Handle:
+
+    def __init__(self, delay, task):
+        self.delay = delay
+        self.task = task
+
+    def _cancel(self):
+        return self.delay.tasks.cancel(self.task)
+
+    def cancel(self):
+        '''Return True if the task was pending, in which case it will now never run.'''
+        with self.delay.taskslock:
+            return self._cancel()
+
+class Periodic:
+
+    def __init__(self, delay, interval, task, skip):
+        self.delay = delay
+        self.interval = interval
+        self.task = task
+        self.skip = skip
+        self.cancelled = False
+
+    def _reschedule(self, when, now):
+        when += self.interval
+        if self.skip and when <= now:
+            when += ((now - when) // self.interval + 1) * self.interval
+        self.current = self.delay._insert(when, self)
+
+    def __call__(self):
+        if not self.cancelled:
+            self.task()
+
+    def _cancel(self):
+        if self.cancelled:
+            return False
+        self.cancelled = True
+        self.delay.tasks.cancel(self.current)
+        return True
+
+    def cancel(self):
+        '''Stop future runs, return True if this call did so.'''
+        with self.delay.taskslock:
+            return self._cancel()
+
+class Heap:
+
+    compaction = .5 # Rebuild once this fraction of entries are cancelled tasks.
+
+    def __init__(self):
+        self.tasks = []
+        self.live = 0
+
+    def __len__(self):
+        return self.live
+
+    def insert(self, task):
+        heapq.heappush(self.tasks, task)
+        self.live += 1
+
+    def insertmany(self, tasks):
+        if len(tasks) < len(self.tasks):
+            for task in tasks:
+                heapq.heappush(self.tasks, task)
+        else: # Linear time beats pushing each one.
+            self.tasks.extend(tasks)
+            heapq.heapify(self.tasks)
+        self.live += len(tasks)
+
+    def cancel(self, task):
+        if not task.pending:
+            return False
+        task.pending = False
+        self.live -= 1
+        if len(self.tasks) - self.live > self.compaction * len(self.tasks):
+            self.compact()
+        return True
+
+    def compact(self):
+        self.tasks = [t for t in self.tasks if t.pending]
+        heapq.heapify(self.tasks)
+
+    def _prune(self):
+        while self.tasks and not self.tasks[0].pending:
+            heapq.heappop(self.tasks)
+
+    def pop(self, now):
+        def g():
+            while True:
+                self._prune()
+                if not (self.tasks and self.tasks[0].when <= now):
+                    break
+                task = heapq.heappop(self.tasks)
+                task.pending = False
+                self.live -= 1
+                yield task
+        return list(g())
+
+    def nextwhen(self):
+        self._prune()
+        if self.tasks:
+            return self.tasks[0].when
+
+    def popall(self):
+        tasks = [t for t in self.tasks if t.pending]
+        for task in tasks:
+            task.pending = False
+        self.tasks.clear()
+        self.live = 0
+        return tasks
+
+class Wheel:
+    '''Hierarchical timing wheel with the given tick resolution in seconds, for constant time insert and expiry.
+    Tasks before the current tick or beyond the horizon of the top level are kept in a Heap instead.'''
+
+    compaction = .5
+
+    def __init__(self, resolution = .001, bits = 8, levels = 4):
+        self.resolution = resolution
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.horizon = 1 << bits * levels
+        self.slots = [[[] for _ in range(1 << bits)] for _ in range(levels)]
+        self.counts = [0] * levels
+        self.heap = Heap()
+        self.live = 0
+        self.tick = None
+        self.next = None # Cached nextwhen, or None if unknown.
+
+    def __len__(self):
+        return self.live
+
+    def _tick(self, when):
+        return math.floor(when / self.resolution)
+
+    def _place(self, tick, task):
+        if self.tick is None:
+            return
+        delta = tick - self.tick
+        if 0 <= delta < self.horizon:
+            level = max(delta.bit_length() - 1, 0) // self.bits
+            self.slots[level][tick >> self.bits * level & self.mask].append(task)
+            self.counts[level] += 1
+            return True
+
+    def insert(self, task):
+        if not self._place(self._tick(task.when), task):
+            self.heap.insert(task)
+        self.live += 1
+        if self.next is not None and task.when < self.next:
+            self.next = task.when
+
+    def insertmany(self, tasks):
+        for task in tasks:
+            self.insert(task)
+
+    def cancel(self, task):
+        if not task.pending:
+            return False
+        task.pending = False
+        self.live -= 1
+        size = sum(self.counts) + len(self.heap.tasks)
+        if size - self.live > self.compaction * size:
+            self.compact()
+        if task.when == self.next:
+            self.next = None
+        return True
+
+    def compact(self):
+        for level, slots in enumerate(self.slots):
+            for slot in slots:
+                slot[:] = [t for t in slot if t.pending]
+            self.counts[level] = sum(map(len, slots))
+        self.heap.compact()
+
+    def _cascade(self):
+        for level in range(1, len(self.slots)):
+            shift = self.bits * level
+            if self.tick & (1 << shift) - 1:
+                break
+            slot = self.slots[level][self.tick >> shift & self.mask]
+            tasks = slot.copy()
+            slot.clear()
+            self.counts[level] -= len(tasks)
+            for task in tasks:
+                if task.pending:
+                    self._place(self._tick(task.when), task)
+
+    def pop(self, now):
+        nowtick = self._tick(now)
+        if self.tick is None:
+            self.tick = nowtick
+        due = []
+        while self.tick < nowtick:
+            self._cascade()
+            slot = self.slots[0][self.tick & self.mask]
+            due.extend(t for t in slot if t.pending)
+            self.counts[0] -= len(slot)
+            slot.clear()
+            self.tick += 1
+            for level, n in enumerate(self.counts):
+                if n:
+                    if level: # Skip to the next cascade of the lowest non-empty level.
+                        shift = self.bits * level
+                        self.tick = min(nowtick, (self.tick - 1 >> shift) + 1 << shift)
+                    break
+            else:
+                self.tick = max(self.tick, nowtick)
+        tasks = self.heap.tasks
+        while tasks:
+            task = tasks[0]
+            tick = self._tick(task.when)
+            if task.pending and (task.when <= now or tick < self.tick or not self._place(tick, task)):
+                break
+            heapq.heappop(tasks)
+        self._cascade()
+        slot = self.slots[0][self.tick & self.mask]
+        if slot:
+            keep = [t for t in slot if t.pending and t.when > now]
+            if len(keep) < len(slot):
+                due.extend(t for t in slot if t.pending and t.when <= now)
+                self.counts[0] -= len(slot) - len(keep)
+                slot[:] = keep
+        for task in due:
+            task.pending = False
+        due.extend(self.heap.pop(now))
+        if due:
+            self.live -= len(due)
+            self.next = None
+            due.sort()
+        return due
+
+    def nextwhen(self):
+        if self.next is not None or not self.live:
+            return self.next
+        best = self.heap.nextwhen()
+        for level, slots in enumerate(self.slots):
+            if self.counts[level]:
+                shift = self.bits * level
+                start = (self.tick >> shift) + (1 if level else 0)
+                for i in range(start, start + len(slots)):
+                    whens = [t.when for t in slots[i & self.mask] if t.pending]
+                    if whens:
+                        if best is None or i << shift <= self._tick(best):
+                            when = min(whens)
+                            if best is None or when < best:
+                                best = when
+                        break
+        self.next = best
+        return best
+
+    def popall(self):
+        tasks = self.heap.popall()
+        for slots in self.slots:
+            for slot in slots:
+                for task in slot:
+                    if task.pending:
+                        task.pending = False
+                        tasks.append(task)
+                slot.clear()
+        self.counts = [0] * len(self.slots)
+        self.live = 0
+        self.next = None
+        return tasks
+
 class Delay(SimpleBackground):
 
     taskindex = 0
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, tasks = None, executor = None, slack = 0, **kwargs):
+        '''If executor is given, due tasks are submitted to it instead of being run on the background thread.
+        Tasks may run up to slack seconds late, so that tasks due close together share one wakeup.'''
         super().__init__(*args, **kwargs)
-        self.tasks = []
+        self.tasks = Heap() if tasks is None else tasks
+        self.executor = executor
+        self.slack = slack
+        self.lateness = Lateness()
+        self.waketime = None
 
     def start(self):
         self.sleeper = Sleeper()
@@ -44,10 +351,13 @@ class Delay(SimpleBackground):
         super().start(self._bg, self.sleeper)
 
     def popall(self):
+        '''Remove and return all pending tasks, their when converted to an epoch time so that they can be passed back to atmany.'''
         with self.taskslock:
-            tasks = self.tasks.copy()
-            self.tasks.clear()
-            return tasks
+            tasks = self.tasks.popall()
+        offset = time.time() - time.monotonic()
+        for task in tasks:
+            task.when += offset
+        return tasks
 
     def _bg(self, sleeper):
         while not self.quit:
@@ -56,28 +366,132 @@ class Delay(SimpleBackground):
             log.debug("Tasks denied: %s", len(self.tasks))
 
     def _insert(self, when, task):
-        heapq.heappush(self.tasks, Task(when, self.taskindex, task))
+        task = Task(when, self.taskindex, task)
+        self.tasks.insert(task)
         self.taskindex += 1
+        return task
 
-    def at(self, when, task):
+    def _insertmany(self, whentasks):
+        tasks = [Task(when, taskindex, task) for taskindex, (when, task) in enumerate(whentasks, self.taskindex)]
+        self.tasks.insertmany(tasks)
+        self.taskindex += len(tasks)
+        return tasks
+
+    def _at(self, when, task):
         with self.taskslock:
-            self._insert(when, task)
-        self.sleeper.interrupt()
+            task = self._insert(when, task)
+            interrupt = self.waketime is None or when + self.slack < self.waketime
+        if interrupt:
+            self.sleeper.interrupt()
+        return task
+
+    def at(self, when, task):
+        '''Run task at the given epoch time, which is converted to the monotonic clock now.
+        Return a Handle that can be used to cancel the task.'''
+        return Handle(self, self._at(when - time.time() + time.monotonic(), task))
 
     def after(self, delay, task):
-        self.at(time.time() + delay, task)
+        return Handle(self, self._at(time.monotonic() + delay, task))
+
+    def atmany(self, whentasks):
+        '''Like at for each (when, task) pair, but with one lock acquisition and at most one interrupt. Return a list of Handles.'''
+        offset = time.monotonic() - time.time()
+        with self.taskslock:
+            tasks = self._insertmany([when + offset, task] for when, task in whentasks)
+            interrupt = bool(tasks) and (self.waketime is None or min(t.when for t in tasks) + self.slack < self.waketime)
+        if interrupt:
+            self.sleeper.interrupt()
+        return [Handle(self, task) for task in tasks]
+
+    def cancelmany(self, handles):
+        '''Cancel the given Handle or Periodic objects with one lock acquisition, return how many were pending.'''
+        with self.taskslock:
+            return sum(h._cancel() for h in handles)
+
+    def every(self, interval, task, skip = False):
+        '''Run task at a fixed rate, the first time after one interval. If skip is true, ticks missed due to lateness are not made up.
+        Return a Periodic that can be used to cancel the schedule.'''
+        if interval <= 0:
+            raise ValueError(f"Interval must be positive: {interval}")
+        periodic = Periodic(self, interval, task, skip)
+        with self.taskslock: # Before the task can run and reschedule itself.
+            periodic.current = self._at(time.monotonic() + interval, periodic)
+        return periodic
 
     def _pop(self, now):
-        def g():
-            while self.tasks and self.tasks[0].when <= now:
-                yield heapq.heappop(self.tasks)
-        return list(g())
+        tasks = self.tasks.pop(now)
+        for task in tasks: # Reschedule while we have the lock.
+            if isinstance(task.task, Periodic):
+                task.task._reschedule(task.when, now)
+        return tasks
+
+    def _fire(self, task):
+        self.lateness.record(time.monotonic() - task.when)
+        task()
 
     def sleeptime(self):
         with self.taskslock:
-            tasks = self._pop(time.time())
-        for task in tasks:
-            task()
+            tasks = self._pop(time.monotonic())
+        if self.executor is None:
+            for task in tasks:
+                self._fire(task)
+        else:
+            for task in tasks:
+                self.executor.submit(self._fire, task)
         with self.taskslock:
-            if self.tasks:
-                return self.tasks[0].when - time.time()
+            when = self.tasks.nextwhen()
+            if when is None:
+                self.waketime = None
+            else:
+                self.waketime = when + self.slack
+                return self.waketime - time.monotonic()
+
+class ShardedDelay:
+    '''Spread tasks over independent Delay shards, each with its own lock and thread, to cut contention between scheduling threads.
+    A shard is chosen by key if given, otherwise each calling thread sticks to a shard.
+    As tasks objects can't be shared, the tasks argument if any should be a factory such as Wheel.'''
+
+    def __init__(self, shards, *args, tasks = Heap, **kwargs):
+        self.shards = [Delay(*args, tasks = tasks(), **kwargs) for _ in range(shards)]
+        self.threadindex = count()
+        self.local = threading.local()
+
+    def _shard(self, key):
+        if key is not None:
+            return self.shards[hash(key) % len(self.shards)]
+        try:
+            return self.local.shard
+        except AttributeError:
+            self.local.shard = shard = self.shards[next(self.threadindex) % len(self.shards)]
+            return shard
+
+    def start(self):
+        for shard in self.shards:
+            shard.start()
+
+    def stop(self):
+        for shard in self.shards:
+            shard.quit.fire()
+        for shard in self.shards:
+            shard.thread.join()
+
+    def at(self, when, task, key = None):
+        return self._shard(key).at(when, task)
+
+    def after(self, delay, task, key = None):
+        return self._shard(key).after(delay, task)
+
+    def every(self, interval, task, skip = False, key = None):
+        return self._shard(key).every(interval, task, skip)
+
+    def atmany(self, whentasks, key = None):
+        return self._shard(key).atmany(whentasks)
+
+    def cancelmany(self, handles):
+        byshard = {}
+        for h in handles:
+            byshard.setdefault(h.delay, []).append(h)
+        return sum(delay.cancelmany(v) for delay, v in byshard.items())
+
+    def popall(self):
+        return [task for shard in self.shards for task in shard.popall()]
@@ -15,10 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
-from .actor import Spawn
+from .actor import depth, Spawn
+from .actor.executor import ManualExecutor
+from .actor.future import Future
 from concurrent.futures import ThreadPoolExecutor
 from diapyr.util import invokeall
 from unittest import TestCase
+import gc, time, weakref
 
 class Sum:
 
@@ -28,6 +31,16 @@ class Sum:
         self.n += k
         return self.n
 
+class Telemetry:
+
+    def __init__(self):
+        self.values = []
+
+    def record(self, value):
+        if value is None:
+            raise ValueError('No value.')
+        self.values.append(value)
+
 class Network:
 
     def download(self, url):
@@ -156,3 +169,74 @@ class TestSpawn(TestCase):
         w = self.spawn(Obj()).m().wait
         with self.assertRaises(TypeError):
             w()
+
+    def test_allof(self):
+        class Obj:
+            def __init__(self, a):
+                self.a = a
+            async def fanout(self):
+                return await Future.allof(self.a.download(k) for k in 'xyz')
+        self.assertEqual(['xx', 'yy', 'zz'], self.spawn(Obj(self.spawn(Network(), Network()))).fanout().wait())
+
+    def test_within(self):
+        from threading import Event
+        class Obj:
+            def block(self):
+                e.wait()
+            def x(self):
+                return 100
+        e = Event()
+        a = self.spawn(Obj())
+        a.block()
+        f = a.x.within(.05)()
+        g = a.x.within(60)()
+        h = a.x()
+        time.sleep(.1)
+        e.set()
+        with self.assertRaises(TimeoutError):
+            f.wait()
+        self.assertEqual(100, g.wait())
+        self.assertEqual(100, h.wait())
+
+    def test_tell(self):
+        telemetry = Telemetry()
+        actor = self.spawn(telemetry)
+        self.assertIsNone(actor.record.tell(1))
+        with self.assertLogs('splut.actor') as cm:
+            actor.record.tell(None)
+            actor.record(2).wait()
+        self.assertEqual([1, 2], telemetry.values)
+        record, = cm.records
+        self.assertIs(ValueError, record.exc_info[0])
+
+    def test_proxyclass(self):
+        a = self.spawn(Sum())
+        b = self.spawn(Sum())
+        self.assertIs(type(a), type(b))
+        self.assertIsNot(type(a), type(self.spawn(Sum(), Network())))
+        self.assertIs(a.plus, a.plus)
+        self.assertIsNot(a.plus, b.plus)
+        self.assertEqual(3, a.plus(3).wait())
+        self.assertEqual(4, b.plus(4).wait())
+        self.assertNotIn('minus', vars(type(a)))
+        self.assertEqual('minus', a.minus.methodname)
+
+    def test_proxyclassgc(self):
+        class Temp:
+            def m(self):
+                pass
+        ref = weakref.ref(Temp)
+        a = self.spawn(Temp())
+        self.assertIn('m', vars(type(a)))
+        del a, Temp
+        gc.collect() # The proxy class, and with it the cache key.
+        gc.collect() # Now Temp.
+        self.assertIsNone(ref())
+
+    def test_depth(self):
+        a = Spawn(ManualExecutor())(Sum())
+        a.plus(1)
+        self.assertEqual(0, depth(a)) # Handed straight to the idle worker.
+        a.plus(2)
+        a.plus(3)
+        self.assertEqual(2, depth(a))
@@ -15,9 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
-from .bg import Sleeper
-from unittest import TestCase
-import threading, time
+from .bg import Instrument, MainBackground, Sample, SimpleBackground, Sleeper
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import skipUnless, TestCase
+import sys, threading, time
 
 class TestSleeper(TestCase):
 
@@ -50,3 +54,128 @@ class TestSleeper(TestCase):
         self.assertAlmostEqual(.1, time.time() - start, delta = .01)
         t.join()
         self._assertnotinterrupted()
+
+def spin(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+class TestSample(TestCase):
+
+    def test_works(self):
+        with TemporaryDirectory() as tempdir:
+            bg = SimpleBackground(Sample(interval = .001, flush = .05, stem = Path(tempdir, 'sample')))
+            bg.daemon = True
+            bg.start(lambda: spin(.2))
+            bg.thread.join()
+            path, = Path(tempdir).iterdir()
+            self.assertTrue(path.name.endswith('.SimpleBackground.folded'))
+            stacks = {}
+            for line in path.read_text().splitlines():
+                stack, n = line.rsplit(' ', 1)
+                stacks[stack] = int(n)
+        self.assertTrue(stacks)
+        self.assertTrue(all(s.startswith('SimpleBackground;') for s in stacks))
+        self.assertTrue(any(s.split(';')[-1].startswith('spin (test_bg.py:') for s in stacks))
+
+def collatz(n):
+    steps = 0
+    while n != 1:
+        if n % 2:
+            n = 3 * n + 1
+        else:
+            n //= 2
+        steps += 1
+    return steps
+
+def notcalled():
+    return 'never'
+
+def catcher():
+    while True:
+        try:
+            yield
+        except KeyError:
+            pass
+
+def thrower():
+    g = catcher()
+    next(g)
+    g.throw(KeyError())
+    time.sleep(.2)
+
+@contextmanager
+def toolsbusy():
+    'Take every free sys.monitoring tool id, so that Instrument must fall back to settrace.'
+    monitoring = getattr(sys, 'monitoring', None)
+    taken = []
+    if monitoring is not None:
+        for tool in range(6):
+            if monitoring.get_tool(tool) is None:
+                monitoring.use_tool_id(tool, __name__)
+                taken.append(tool)
+    try:
+        yield
+    finally:
+        for tool in taken:
+            monitoring.free_tool_id(tool)
+
+class TestInstrument(TestCase):
+
+    def test_works(self):
+        with TemporaryDirectory() as tempdir:
+            def target():
+                t = threading.Thread(target = collatz, args = [6])
+                t.start()
+                t.join()
+                return collatz(27)
+            self.assertEqual(111, Instrument([__name__], stem = Path(tempdir, 'instrument'))(target))
+            path, = Path(tempdir).iterdir()
+            timings, coverage = path.read_text().split('\n\n')
+        firstlineno = collatz.__code__.co_firstlineno
+        timings = {line.split(' ')[2]: line.split(' ')[:2] for line in timings.splitlines()[1:]}
+        calls, seconds = timings[f"{__file__}:{firstlineno}(collatz)"]
+        self.assertEqual('2', calls)
+        self.assertGreater(float(seconds), 0)
+        self.assertNotIn('notcalled', ''.join(timings))
+        self.assertTrue(any(l.startswith(f"{__file__} {firstlineno + 1}-{firstlineno + 4},{firstlineno + 6}-{firstlineno + 8},") for l in coverage.splitlines()))
+
+    def test_toolsbusy(self):
+        with toolsbusy(), TemporaryDirectory() as tempdir:
+            self.assertEqual(111, Instrument([__name__], stem = Path(tempdir, 'instrument'))(collatz, 27))
+            path, = Path(tempdir).iterdir()
+            self.assertIn('(collatz)', path.read_text())
+
+    def _timings(self, context):
+        with context, TemporaryDirectory() as tempdir:
+            Instrument([__name__], stem = Path(tempdir, 'instrument'))(thrower)
+            path, = Path(tempdir).iterdir()
+            timings, _ = path.read_text().split('\n\n')
+        return {line.split(' ')[2].rsplit('(', 1)[1][:-1]: (int(line.split(' ')[0]), float(line.split(' ')[1])) for line in timings.splitlines()[1:]}
+
+    def test_throw(self):
+        for context in nullcontext(), toolsbusy():
+            timings = self._timings(context)
+            self.assertEqual(1, timings['thrower'][0])
+            self.assertGreaterEqual(timings['thrower'][1], .2)
+            self.assertEqual(1, timings['catcher'][0]) # Not each resume.
+
+    @skipUnless(hasattr(sys, 'monitoring'), 'Only one settrace tracer at a time.')
+    def test_nested(self):
+        with TemporaryDirectory() as tempdir:
+            inner = Instrument([__name__], stem = Path(tempdir, 'inner'))
+            self.assertEqual(111, Instrument([__name__], stem = Path(tempdir, 'outer'))(inner, collatz, 27))
+            for path in Path(tempdir).iterdir():
+                self.assertIn('(collatz)', path.read_text())
+
+    def test_mainbackground(self):
+        bg = MainBackground(SimpleNamespace(trace = True, profile = SimpleNamespace(stem = 'prof')))
+        self.assertIsInstance(bg.profile, Instrument)
+        self.assertEqual(['splut'], bg.profile.prefixes)
+        self.assertEqual('prof', bg.profile.stem)
+        self.assertIs(bg, bg.bg)
+        bg = MainBackground(SimpleNamespace(trace = True, profile = object(), prefixes = ['foo', 'bar']))
+        self.assertEqual(['foo', 'bar'], bg.profile.prefixes)
+        self.assertEqual('instrument', bg.profile.stem)
+        instrument = Instrument(['baz'])
+        self.assertIs(instrument, MainBackground(SimpleNamespace(trace = True, profile = instrument)).profile)
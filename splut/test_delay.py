@@ -15,16 +15,193 @@
 # You should have received a copy of the GNU General Public License
 # along with splut.  If not, see <http://www.gnu.org/licenses/>.
 
-from .delay import Delay
+from .actor.executor import ManualExecutor
+from .delay import Delay, Handle, Heap, Periodic, ShardedDelay, Wheel
+from random import Random
 from unittest import TestCase
+import threading, time
 
 class TestDelay(TestCase):
 
     def test_simultaneous(self):
-        d = Delay()
+        for tasks in Heap(), Wheel():
+            self._simultaneous(Delay(tasks = tasks))
+
+    def _simultaneous(self, d):
         def f(): pass
         def g(): pass
         d._insert(500, f)
         d._insert(500, g)
         self.assertEqual([], d._pop(499.9))
         self.assertEqual([f, g], [t.task for t in d._pop(500)])
+
+    def test_cancel(self):
+        for tasks in Heap(), Wheel(1):
+            d = Delay(tasks = tasks)
+            d.taskslock = threading.RLock()
+            d._pop(0)
+            handles = [Handle(d, d._insert(when, None)) for when in range(10)]
+            self.assertTrue(handles[3].cancel())
+            self.assertFalse(handles[3].cancel())
+            self.assertEqual(9, len(d.tasks))
+            self.assertEqual([0, 1, 2, 4], [t.when for t in d._pop(4)])
+            self.assertFalse(handles[0].cancel())
+            for h in handles[5:9]:
+                h.cancel()
+            self.assertEqual(1, len(d.tasks))
+            self.assertEqual(9, d.tasks.nextwhen())
+            self.assertEqual([9], [t.when for t in d._pop(100)])
+            self.assertEqual(0, len(d.tasks))
+
+    def test_compaction(self):
+        d = Delay()
+        d.taskslock = threading.RLock()
+        handles = [Handle(d, d._insert(when, None)) for when in range(10)]
+        for h in handles[:5]:
+            h.cancel()
+        self.assertEqual(10, len(d.tasks.tasks))
+        handles[5].cancel()
+        self.assertEqual(4, len(d.tasks.tasks))
+
+    def test_wheelmatchesheap(self):
+        random = Random(0)
+        h = Delay()
+        w = Delay(tasks = Wheel(1, 2, 3))
+        now = 0
+        for d in h, w:
+            d._pop(now)
+        handles = []
+        for _ in range(3000):
+            r = random.random()
+            if r < .5:
+                when = now + random.choice([-5, 0, 1, 10, 100, 1000]) * random.random()
+                handles.append([d._insert(when, None) for d in (h, w)])
+            elif r < .7:
+                if handles:
+                    tasks = handles.pop(random.randrange(len(handles)))
+                    self.assertEqual(*[d.tasks.cancel(task) for d, task in zip((h, w), tasks)])
+            else:
+                now += random.choice([.5, 3, 30, 300])
+                self.assertEqual(*[[(t.when, t.taskindex) for t in d._pop(now)] for d in (h, w)])
+            self.assertEqual(len(h.tasks), len(w.tasks))
+            self.assertEqual(h.tasks.nextwhen(), w.tasks.nextwhen())
+        self.assertEqual(*[sorted((t.when, t.taskindex) for t in d.tasks.popall()) for d in (h, w)])
+        self.assertEqual(0, len(w.tasks))
+
+    def test_executor(self):
+        executor = ManualExecutor()
+        v = []
+        d = Delay(executor = executor)
+        d.taskslock = threading.RLock()
+        now = time.monotonic()
+        for k in range(3):
+            d._insert(now - k, lambda k = k: v.append(k))
+        d._insert(now + 60, None)
+        self.assertAlmostEqual(60, d.sleeptime(), delta = 1)
+        self.assertEqual([], v)
+        self.assertEqual(3, executor.run())
+        self.assertEqual([2, 1, 0], v)
+        self.assertEqual(3, d.lateness.count)
+        self.assertAlmostEqual(2, d.lateness.max, delta = .5)
+        self.assertAlmostEqual(1, d.lateness.mean(), delta = .5)
+
+    def _periodic(self, skip):
+        d = Delay()
+        d.taskslock = threading.RLock()
+        p = Periodic(d, 10, None, skip)
+        p.current = d._insert(10, p)
+        return d, p
+
+    def test_every(self):
+        d, p = self._periodic(False)
+        self.assertEqual([], d._pop(9))
+        self.assertEqual([10], [t.when for t in d._pop(12)])
+        for when in 20, 30, 40: # Each missed tick is made up.
+            self.assertEqual([when], [t.when for t in d._pop(45)])
+        self.assertEqual([], d._pop(45))
+        self.assertEqual(50, d.tasks.nextwhen())
+        self.assertTrue(p.cancel())
+        self.assertFalse(p.cancel())
+        self.assertEqual([], d._pop(100))
+        self.assertEqual(0, len(d.tasks))
+
+    def test_everyskip(self):
+        d, p = self._periodic(True)
+        self.assertEqual([10], [t.when for t in d._pop(45)])
+        self.assertEqual(50, d.tasks.nextwhen())
+        self.assertEqual([50], [t.when for t in d._pop(50)])
+        self.assertEqual(60, d.tasks.nextwhen())
+
+    def test_everyinvalid(self):
+        d = Delay()
+        d.taskslock = threading.RLock()
+        for interval in 0, -1:
+            with self.assertRaises(ValueError):
+                d.every(interval, None, skip = True)
+        self.assertEqual(0, len(d.tasks))
+
+    def test_slack(self):
+        class Sleeper:
+            def interrupt(self):
+                interrupts.append(None)
+        interrupts = []
+        d = Delay(slack = 5)
+        d.taskslock = threading.RLock()
+        d.sleeper = Sleeper()
+        now = time.monotonic()
+        d._at(now + 100, None)
+        self.assertEqual(1, len(interrupts))
+        self.assertAlmostEqual(105, d.sleeptime(), delta = 1)
+        d._at(now + 101, None)
+        d._at(now + 100.5, None)
+        self.assertEqual(1, len(interrupts)) # Both fit the existing wakeup.
+        d._at(now + 90, None)
+        self.assertEqual(2, len(interrupts))
+        self.assertAlmostEqual(95, d.sleeptime(), delta = 1)
+        self.assertEqual(4, len(d._pop(now + 101)))
+
+    def test_many(self):
+        for tasks in Heap(), Wheel(1):
+            d = Delay(tasks = tasks)
+            d.taskslock = threading.RLock()
+            d.sleeper = self
+            self.interrupts = 0
+            d._pop(time.monotonic())
+            now = time.time()
+            d.at(now + 50, None)
+            d.sleeptime()
+            handles = d.atmany([now + k, None] for k in range(100))
+            self.assertEqual(2, self.interrupts)
+            self.assertEqual(101, len(d.tasks))
+            self.assertEqual(50, d.cancelmany(handles[::2]))
+            self.assertEqual(0, d.cancelmany(handles[::2]))
+            self.assertEqual(51, len(d.tasks))
+            self.assertEqual(sorted([50, *range(1, 100, 2)]), sorted(round(t.when - time.monotonic()) for t in d.tasks.popall()))
+
+    def interrupt(self):
+        self.interrupts += 1
+
+class TestShardedDelay(TestCase):
+
+    def test_works(self):
+        d = ShardedDelay(3, tasks = Wheel)
+        self.assertEqual(3, len({id(shard.tasks) for shard in d.shards}))
+        d.start()
+        try:
+            v = []
+            handles = [d.after(.05, lambda k = k: v.append(k), key = k) for k in range(6)]
+            self.assertEqual({h.delay for h in handles}, set(d.shards))
+            self.assertIs(d._shard(None), d._shard(None))
+            d.after(60, None)
+            self.assertEqual(2, d.cancelmany(handles[4:]))
+            time.sleep(.2)
+            self.assertEqual([0, 1, 2, 3], sorted(v))
+            tasks = d.popall()
+            self.assertEqual(1, len(tasks))
+            self.assertAlmostEqual(time.time() + 59.8, tasks[0].when, delta = 1)
+            (when, _, task), = tasks
+            self.assertIs(tasks[0].task, task)
+            handle, = d.atmany((t.when, t.task) for t in tasks)
+            self.assertAlmostEqual(time.monotonic() + 59.8, handle.task.when, delta = 1)
+        finally:
+            d.stop()